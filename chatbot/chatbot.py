@@ -6,223 +6,300 @@ Enhanced with RAG capabilities for more advanced responses.
 
 import re
 import sys
-import os
-from dotenv import load_dotenv
+import asyncio
+from collections import ChainMap
 from knowledge_base import KNOWLEDGE_BASE, DETAILED_EXPLANATIONS
 from rag_chatbot import RAGChatbot
+from config import CONFIG
+from intent_matcher import IntentMatcher
 
-load_dotenv()
+INTENTS = (
+    ('project', ('what is', 'about', 'purpose', 'project', 'repository')),
+    ('structure', ('code', 'structure', 'files', 'file', 'organization')),
+    ('kernel', ('kernel', 'function', 'creategaussiankernel', 'create', 'gaussian function')),
+    ('main', ('main', 'entry', 'program flow', 'execution')),
+    ('concept', ('concept', 'gaussian', 'blur', 'sigma', 'convolution', 'filter', 'normalize', 'normalization')),
+    ('usage', ('use', 'usage', 'how to', 'run', 'compile', 'build', 'execute', 'command', 'argument')),
+    ('dependency', ('depend', 'opencv', 'library', 'libraries', 'requirement')),
+    ('algorithm', ('algorithm', 'detail', 'explain', 'how does', 'pipeline', 'process')),
+)
+
+_INTENT_MATCHER = IntentMatcher(INTENTS)
+
+# Intent keywords are plain substrings ('use' occurs in 'cause', 'main' in
+# 'remain'), so an intent's answer skips RAG only if one of these specific
+# words occurs as a whole word
+_CONFIDENT_KEYWORDS = {
+    'kernel': re.compile(r'\b(creategaussiankernel|gaussian kernel|kernel function)\b'),
+    'main': re.compile(r'\bmain\(\)|\b(main function|entry point|program flow)\b'),
+    'usage': re.compile(r'\b(compile|compilation|usage|command[- ]line|arguments?|how to (use|run|build))\b'),
+    'dependency': re.compile(r'\b(opencv|dependency|dependencies|library|libraries|requirements?)\b'),
+    'algorithm': re.compile(r'\b(algorithm|pipeline)\b'),
+}
+
+_EXIT_COMMANDS = frozenset({'exit', 'quit', 'bye'})
+_HELP_COMMANDS = frozenset({'help', '?'})
+_COMMANDS = _EXIT_COMMANDS | _HELP_COMMANDS
+
+_SEPARATOR = "=" * 80
+_GREETING_TEXT = f"""{_SEPARATOR}
+Gaussian Filter Chatbot (RAG-Enhanced)
+{_SEPARATOR}
+Welcome! I can help you understand the Gaussian filter implementation
+in the test_cpp repository. You can ask me about:
+- The project structure and files
+- How the Gaussian filter works
+- The code implementation details
+- How to compile and use the software
+- Specific concepts like kernels, convolution, etc.
+
+Type 'exit', 'quit', or 'bye' to end the conversation.
+Type 'help' to see this message again.
+"""
+_STATUS_AZURE = "\n[AI-powered responses enabled with Azure OpenAI]\n"
+_STATUS_OPENAI = "\n[AI-powered responses enabled with OpenAI]\n"
+_STATUS_BASIC = "\n[Running in basic mode - set OPENAI_API_KEY or AZURE_OPENAI_API_KEY for AI-powered responses]\n"
+
+_PROJECT_TEMPLATE = ("Project: {name}\n\n"
+                     "Description: {description}\n\n"
+                     "Repository: {repository}\n\n"
+                     "Main Files: {files}")
+_FUNCTION_TEMPLATE = ("Function: {name}\n\n"
+                      "Purpose: {purpose}\n\n"
+                      "Parameters:\n{parameters}"
+                      "\nReturn: {return[type]} - {return[description]}\n\n"
+                      "Algorithm: {algorithm}\n\n"
+                      "For more details, ask about the '{details}'.")
+_DEPENDENCY_TEMPLATE = ("{name}: {description}\n"
+                        "Version: {version}\n\n"
+                        "Components Used:\n{components}")
+_FALLBACK_RESPONSE = ("I'm not sure how to answer that. You can ask me about the project, "
+                      "code structure, Gaussian kernel function, main function, concepts, "
+                      "usage, or dependencies. Type 'help' for more information.")
 
 class GaussianFilterChatbot(RAGChatbot):
+    __slots__ = ('_fn_kernel', '_fn_main', '_cached_responses', '_concept_index')
+    
     def __init__(self, repo_path: str = "../"):
         """Initialize the chatbot with the given repository path."""
         super().__init__(repo_path=repo_path, language="en")
+        self._fn_kernel = self.knowledge_base['functions']['createGaussianKernel']
+        self._fn_main = self.knowledge_base['functions']['main']
+        self._cached_responses = self._render_static_responses()
+        self._concept_index = self._build_concept_index()
         
     def show_greeting(self):
         """Display the initial greeting message."""
-        print("="*80)
-        print("Gaussian Filter Chatbot (RAG-Enhanced)")
-        print("="*80)
-        print("Welcome! I can help you understand the Gaussian filter implementation")
-        print("in the test_cpp repository. You can ask me about:")
-        print("- The project structure and files")
-        print("- How the Gaussian filter works")
-        print("- The code implementation details")
-        print("- How to compile and use the software")
-        print("- Specific concepts like kernels, convolution, etc.")
-        print("\nType 'exit', 'quit', or 'bye' to end the conversation.")
-        print("Type 'help' to see this message again.")
-        
-        if (os.getenv("AZURE_OPENAI_API_KEY") and os.getenv("AZURE_OPENAI_ENDPOINT") and self.llm):
-            print("\n[AI-powered responses enabled with Azure OpenAI]")
-        elif os.getenv("OPENAI_API_KEY") and self.llm:
-            print("\n[AI-powered responses enabled with OpenAI]")
+        self._ensure_llm()
+        if CONFIG.use_azure and self.llm:
+            status = _STATUS_AZURE
+        elif CONFIG.use_openai and self.llm:
+            status = _STATUS_OPENAI
         else:
-            print("\n[Running in basic mode - set OPENAI_API_KEY or AZURE_OPENAI_API_KEY for AI-powered responses]")
+            status = _STATUS_BASIC
             
-        print("="*80)
+        sys.stdout.write(f"{_GREETING_TEXT}{status}{_SEPARATOR}\n")
+        sys.stdout.flush()
         self.greeting_shown = True
     
+    def _normalize(self, user_input):
+        """Strip and lowercase user input; exact commands are returned as-is."""
+        user_input = user_input.strip()
+        if user_input not in _COMMANDS:
+            user_input = user_input.lower()
+        return user_input
+    
     def get_response_with_pattern_matching(self, user_input):
-        """Process user input and generate a response using pattern matching."""
-        user_input = user_input.lower().strip()
-        
-        if user_input in ['exit', 'quit', 'bye']:
-            return "Goodbye! I hope I helped you understand the Gaussian filter implementation."
+        """Process user input and generate a response using pattern matching, or None if no pattern matches."""
+        return self._get_pattern_response(self._normalize(user_input))[1]
+    
+    def _get_pattern_response(self, user_input):
+        """Match already-normalized input and return the intent and the response (None if none)."""
+        if user_input in _EXIT_COMMANDS:
+            return None, "Goodbye! I hope I helped you understand the Gaussian filter implementation."
         
-        if user_input in ['help', '?']:
+        if user_input in _HELP_COMMANDS:
             self.show_greeting()
-            return ""
+            return None, ""
         
-        if re.search(r'what is|about|purpose|project|repository', user_input):
-            return self._get_project_info()
+        intent = _INTENT_MATCHER.match(user_input)
         
-        if re.search(r'code|structure|files|file|organization', user_input):
-            return self._get_code_structure()
+        if intent == 'concept':
+            return intent, self._get_concept_info(user_input)
         
-        if re.search(r'kernel|function|creategaussiankernel|create|gaussian function', user_input):
-            return self._get_kernel_function_info()
+        if intent in self._cached_responses:
+            return intent, self._cached_responses[intent]
         
-        if re.search(r'main|entry|program flow|execution', user_input):
-            return self._get_main_function_info()
+        if intent == 'algorithm':
+            if 'kernel' in user_input or 'gaussian' in user_input:
+                return intent, self.detailed_explanations['gaussian_kernel_algorithm']
+            if 'pipeline' in user_input or 'process' in user_input or 'image' in user_input:
+                return intent, self.detailed_explanations['image_processing_pipeline']
         
-        if re.search(r'concept|gaussian|blur|sigma|convolution|filter|normalize|normalization', user_input):
-            return self._get_concept_info(user_input)
+        return intent, None
+                
+    async def aget_response(self, user_input, on_token=None):
+        """Get response to user input asynchronously, streaming RAG answers through on_token."""
+        user_input = self._normalize(user_input)
         
-        if re.search(r'use|usage|how to|run|compile|build|execute|command|argument', user_input):
-            return self._get_usage_info()
+        if user_input in _EXIT_COMMANDS:
+            return "Goodbye! I hope I helped you understand the Gaussian filter implementation."
         
-        if re.search(r'depend|opencv|library|libraries|requirement', user_input):
-            return self._get_dependency_info()
+        if user_input in _HELP_COMMANDS:
+            self.show_greeting()
+            return ""
         
-        if re.search(r'algorithm|detail|explain|how does|pipeline|process', user_input):
-            if 'kernel' in user_input or 'gaussian' in user_input:
-                return self.detailed_explanations['gaussian_kernel_algorithm']
-            if 'pipeline' in user_input or 'process' in user_input or 'image' in user_input:
-                return self.detailed_explanations['image_processing_pipeline']
+        return await super().aget_response(user_input, on_token) or _FALLBACK_RESPONSE
         
-        return ("I'm not sure how to answer that. You can ask me about the project, "
-                "code structure, Gaussian kernel function, main function, concepts, "
-                "usage, or dependencies. Type 'help' for more information.")
-                
     def get_response(self, user_input):
         """Get response to user input, using RAG if available."""
-        user_input = user_input.lower().strip()
+        user_input = self._normalize(user_input)
         
-        if user_input in ['exit', 'quit', 'bye']:
+        if user_input in _EXIT_COMMANDS:
             return "Goodbye! I hope I helped you understand the Gaussian filter implementation."
         
-        if user_input in ['help', '?']:
+        if user_input in _HELP_COMMANDS:
             self.show_greeting()
             return ""
         
-        agent_response = self.get_response_with_agent(user_input)
-        if agent_response:
-            return agent_response
-            
-        rag_response = self.get_response_with_rag(user_input)
-        if not rag_response:
-            return self.get_response_with_pattern_matching(user_input)
-            
-        return rag_response
+        return super().get_response(user_input) or _FALLBACK_RESPONSE
+    
+    def _pattern_is_confident(self, user_input, intent, response):
+        """Check whether a pattern-matching answer is specific enough to skip RAG."""
+        if intent == 'concept':
+            return response != self._cached_responses['concept']
+        keywords = _CONFIDENT_KEYWORDS.get(intent)
+        return keywords is not None and keywords.search(user_input) is not None
+    
+    def _render_static_responses(self):
+        """Pre-render the responses that only depend on the static knowledge base."""
+        return {
+            'project': self._get_project_info(),
+            'structure': self._get_code_structure(),
+            'kernel': self._get_kernel_function_info(),
+            'main': self._get_main_function_info(),
+            'concept': self._get_concepts_overview(),
+            'usage': self._get_usage_info(),
+            'dependency': self._get_dependency_info(),
+        }
     
     def _get_project_info(self):
         """Get information about the project."""
         project = self.knowledge_base['project']
-        return (f"Project: {project['name']}\n\n"
-                f"Description: {project['description']}\n\n"
-                f"Repository: {project['repository']}\n\n"
-                f"Main Files: {', '.join(project['files'])}")
+        return _PROJECT_TEMPLATE.format_map(ChainMap({'files': ', '.join(project['files'])}, project))
     
     def _get_code_structure(self):
         """Get information about the code structure."""
         structure = self.knowledge_base['code_structure']
-        result = "Code Structure:\n\n"
-        for file, description in structure.items():
-            result += f"• {file}: {description}\n"
-        return result
+        parts = ["Code Structure:\n\n"]
+        parts.extend(f"• {file}: {description}\n" for file, description in structure.items())
+        return "".join(parts)
     
     def _get_kernel_function_info(self):
         """Get information about the Gaussian kernel function."""
-        func = self.knowledge_base['functions']['createGaussianKernel']
-        
-        result = f"Function: createGaussianKernel\n\n"
-        result += f"Purpose: {func['purpose']}\n\n"
-        
-        result += "Parameters:\n"
-        for param in func['parameters']:
-            result += f"• {param['name']} ({param['type']}): {param['description']}\n"
-        
-        result += f"\nReturn: {func['return']['type']} - {func['return']['description']}\n\n"
-        result += f"Algorithm: {func['algorithm']}\n\n"
-        result += f"For more details, ask about the 'gaussian kernel algorithm'."
-        
-        return result
+        return self._format_function('createGaussianKernel', self._fn_kernel, 'gaussian kernel algorithm')
     
     def _get_main_function_info(self):
         """Get information about the main function."""
-        func = self.knowledge_base['functions']['main']
-        
-        result = f"Function: main\n\n"
-        result += f"Purpose: {func['purpose']}\n\n"
-        
-        result += "Parameters:\n"
-        for param in func['parameters']:
-            result += f"• {param['name']} ({param['type']}): {param['description']}\n"
-        
-        result += f"\nReturn: {func['return']['type']} - {func['return']['description']}\n\n"
-        result += f"Algorithm: {func['algorithm']}\n\n"
-        result += f"For more details, ask about the 'image processing pipeline'."
-        
-        return result
+        return self._format_function('main', self._fn_main, 'image processing pipeline')
+    
+    def _format_function(self, name, func, details):
+        """Render a function entry of the knowledge base."""
+        parameters = "".join(f"• {param['name']} ({param['type']}): {param['description']}\n"
+                             for param in func['parameters'])
+        return _FUNCTION_TEMPLATE.format_map(
+            ChainMap({'name': name, 'parameters': parameters, 'details': details}, func))
     
     def _get_concept_info(self, user_input):
         """Get information about concepts."""
-        concepts = self.knowledge_base['concepts']
+        for name, response in self._concept_index.items():
+            if name in user_input:
+                return response
         
-        for concept, description in concepts.items():
-            if concept.replace('_', ' ') in user_input:
-                return f"{concept.replace('_', ' ').title()}: {description}"
+        return self._cached_responses['concept']
+    
+    def _build_concept_index(self):
+        """Map normalized concept names to their pre-rendered answers."""
+        return {
+            concept.replace('_', ' ').lower(): f"{concept.replace('_', ' ').title()}: {description}"
+            for concept, description in self.knowledge_base['concepts'].items()
+        }
+    
+    def _get_concepts_overview(self):
+        """Get an overview of all concepts."""
+        concepts = self.knowledge_base['concepts']
         
-        result = "Concepts in Gaussian Image Filtering:\n\n"
-        for concept, description in concepts.items():
-            result += f"• {concept.replace('_', ' ').title()}: {description}\n\n"
+        parts = ["Concepts in Gaussian Image Filtering:\n\n"]
+        parts.extend(f"• {concept.replace('_', ' ').title()}: {description}\n\n"
+                     for concept, description in concepts.items())
         
-        return result
+        return "".join(parts)
     
     def _get_usage_info(self):
         """Get information about usage."""
         usage = self.knowledge_base['usage']
         
-        result = "How to Use the Gaussian Filter:\n\n"
-        result += f"Compilation: {usage['compilation']}\n\n"
-        result += f"Execution: {usage['execution']}\n\n"
-        
-        result += "Command-line Arguments:\n"
-        for arg in usage['command_line_args']:
-            result += f"• {arg['name']}: {arg['description']}\n"
-        
-        result += "\nExamples:\n"
-        for example in usage['examples']:
-            result += f"• {example['command']}\n  {example['description']}\n"
+        args = "".join(f"• {arg['name']}: {arg['description']}\n"
+                       for arg in usage['command_line_args'])
+        examples = "".join(f"• {example['command']}\n  {example['description']}\n"
+                           for example in usage['examples'])
         
-        return result
+        return (f"How to Use the Gaussian Filter:\n\n"
+                f"Compilation: {usage['compilation']}\n\n"
+                f"Execution: {usage['execution']}\n\n"
+                f"Command-line Arguments:\n{args}"
+                f"\nExamples:\n{examples}")
     
     def _get_dependency_info(self):
         """Get information about dependencies."""
         deps = self.knowledge_base['dependencies']
         
-        result = "Dependencies:\n\n"
+        parts = ["Dependencies:\n\n"]
         for _, dep in deps.items():
-            result += f"{dep['name']}: {dep['description']}\n"
-            result += f"Version: {dep['version']}\n\n"
-            
-            result += "Components Used:\n"
-            for comp in dep['components_used']:
-                result += f"• {comp['name']}: {comp['purpose']}\n"
+            components = "".join(f"• {comp['name']}: {comp['purpose']}\n"
+                                 for comp in dep['components_used'])
+            parts.append(_DEPENDENCY_TEMPLATE.format_map(ChainMap({'components': components}, dep)))
         
-        return result
+        return "".join(parts)
     
     def run(self):
-        """Run the chatbot in interactive mode."""
+        """Run the chatbot in interactive mode, streaming RAG answers as they are generated."""
         self.show_greeting()
         
+        # One event loop serves every turn, so the async HTTP clients of the
+        # language model stay bound to it. Unlike asyncio.run, run_until_complete
+        # installs no SIGINT handler, so Ctrl-C still raises KeyboardInterrupt
+        loop = asyncio.new_event_loop()
         try:
             while True:
                 user_input = input("\nYou: ").strip()
                 if not user_input:
                     continue
                 
-                response = self.get_response(user_input)
-                if response:
+                streamed = []
+                
+                def print_token(token):
+                    if not streamed:
+                        print("\nChatbot: ", end="")
+                    streamed.append(token)
+                    print(token, end="", flush=True)
+                    
+                response = loop.run_until_complete(
+                    self.aget_response(user_input, on_token=print_token)
+                )
+                if streamed:
+                    print()
+                elif response:
                     print(f"\nChatbot: {response}")
                 
-                if user_input.lower() in ['exit', 'quit', 'bye']:
+                if user_input.lower() in _EXIT_COMMANDS:
                     break
         except KeyboardInterrupt:
             print("\n\nGoodbye! I hope I helped you understand the Gaussian filter implementation.")
         except Exception as e:
             print(f"\nAn error occurred: {e}")
+        finally:
+            loop.close()
 
 if __name__ == "__main__":
     chatbot = GaussianFilterChatbot()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Chatbot settings, read once from the environment and the .env file.
+"""
+
+import os
+from dataclasses import dataclass
+from typing import Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+@dataclass(frozen=True)
+class Config:
+    """Settings of the chatbot, the language model and the vector store."""
+
+    openai_api_key: Optional[str] = None
+    azure_openai_api_key: Optional[str] = None
+    azure_openai_endpoint: Optional[str] = None
+    azure_openai_api_version: str = "2023-05-15"
+    azure_openai_deployment_name: str = "chat"
+    azure_openai_embedding_deployment_name: str = "embedding"
+    llm_model: str = "gpt-3.5-turbo"
+    embedding_model: str = "text-embedding-3-small"
+    embedding_backend: str = "torch"
+    embed_batch: int = 512
+    embedding_concurrency: int = 8
+    embed_cache_db: str = "./.embed_cache.sqlite"
+    llm_cache_backend: str = "sqlite"
+    llm_cache_db: str = "./.llm_cache.sqlite"
+    redis_url: str = "redis://localhost:6379"
+    memory_max_tokens: int = 2000
+    hybrid_sparse_weight: float = 0.1
+    hybrid_dense_weight: float = 0.9
+    rerank_model: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    rerank_model_ja: str = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"
+    rerank_fetch_k: int = 20
+    rerank_top_n: int = 3
+    mmr_fetch_k: int = 60
+    mmr_lambda_mult: float = 0.5
+    chroma_db_directory: str = "./chroma_db"
+    chroma_batch_size: int = 100
+    force_reindex: bool = False
+
+    @property
+    def use_azure(self) -> bool:
+        """Whether Azure OpenAI is configured."""
+        return bool(self.azure_openai_api_key and self.azure_openai_endpoint)
+
+    @property
+    def use_openai(self) -> bool:
+        """Whether OpenAI is configured."""
+        return bool(self.openai_api_key)
+
+    @classmethod
+    def from_env(cls) -> "Config":
+        """
+        Read the settings from environment variables.
+
+        Returns:
+            Settings with defaults for unset variables
+        """
+        defaults = cls()
+        return cls(
+            openai_api_key=os.getenv("OPENAI_API_KEY"),
+            azure_openai_api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+            azure_openai_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+            azure_openai_api_version=os.getenv("AZURE_OPENAI_API_VERSION", defaults.azure_openai_api_version),
+            azure_openai_deployment_name=os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME",
+                                                   defaults.azure_openai_deployment_name),
+            azure_openai_embedding_deployment_name=os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME",
+                                                             defaults.azure_openai_embedding_deployment_name),
+            llm_model=os.getenv("LLM_MODEL", defaults.llm_model),
+            embedding_model=os.getenv("EMBEDDING_MODEL", defaults.embedding_model),
+            embedding_backend=os.getenv("EMBEDDING_BACKEND", defaults.embedding_backend).lower(),
+            embed_batch=int(os.getenv("EMBED_BATCH", defaults.embed_batch)),
+            embedding_concurrency=int(os.getenv("EMBEDDING_CONCURRENCY", defaults.embedding_concurrency)),
+            embed_cache_db=os.getenv("EMBED_CACHE_DB", defaults.embed_cache_db),
+            llm_cache_backend=os.getenv("LLM_CACHE_BACKEND", defaults.llm_cache_backend).lower(),
+            llm_cache_db=os.getenv("LLM_CACHE_DB", defaults.llm_cache_db),
+            redis_url=os.getenv("REDIS_URL", defaults.redis_url),
+            memory_max_tokens=int(os.getenv("MEMORY_MAX_TOKENS", defaults.memory_max_tokens)),
+            hybrid_sparse_weight=float(os.getenv("HYBRID_SPARSE_WEIGHT", defaults.hybrid_sparse_weight)),
+            hybrid_dense_weight=float(os.getenv("HYBRID_DENSE_WEIGHT", defaults.hybrid_dense_weight)),
+            rerank_model=os.getenv("RERANK_MODEL", defaults.rerank_model),
+            rerank_model_ja=os.getenv("RERANK_MODEL_JA", defaults.rerank_model_ja),
+            rerank_fetch_k=int(os.getenv("RERANK_FETCH_K", defaults.rerank_fetch_k)),
+            rerank_top_n=int(os.getenv("RERANK_TOP_N", defaults.rerank_top_n)),
+            mmr_fetch_k=int(os.getenv("MMR_FETCH_K", defaults.mmr_fetch_k)),
+            mmr_lambda_mult=float(os.getenv("MMR_LAMBDA_MULT", defaults.mmr_lambda_mult)),
+            chroma_db_directory=os.getenv("CHROMA_DB_DIRECTORY", defaults.chroma_db_directory),
+            chroma_batch_size=int(os.getenv("CHROMA_BATCH_SIZE", defaults.chroma_batch_size)),
+            force_reindex=os.getenv("FORCE_REINDEX", "False").lower() in ("true", "1", "yes")
+        )
+
+CONFIG = Config.from_env()
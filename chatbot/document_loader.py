@@ -4,54 +4,73 @@ Utility for loading and processing source code files from the repository.
 """
 
 import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Optional
-
-from langchain_community.document_loaders import TextLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from typing import List, Dict, Iterable, Iterator, Optional
 
 class SourceCodeLoader:
     """Loads and processes source code files from the repository."""
     
-    def __init__(self, repo_path: str):
-        """Initialize with the path to the repository."""
+    __slots__ = ('repo_path', 'specific_paths', '_splitter_cache')
+    
+    def __init__(self, repo_path: str, specific_paths: Optional[List[str]] = None):
+        """
+        Initialize with the path to the repository.
+        
+        Args:
+            repo_path: Path to the repository
+            specific_paths: Directories to scan instead of the whole repository
+        """
         self.repo_path = Path(repo_path)
+        self.specific_paths = [self.repo_path] if specific_paths is None else [Path(p) for p in specific_paths]
+        self._splitter_cache = {}
         
-    def load_source_files(self, extensions: List[str] = ['.cpp', '.h', 'Makefile']) -> List[Dict]:
+    def load_source_files(self, extensions: List[str] = ['.cpp', '.h', 'Makefile'],
+                          max_workers: int = 16) -> List[Dict]:
         """
         Load all source files with the specified extensions.
         
         Args:
             extensions: List of file extensions to include
+            max_workers: Maximum number of files read concurrently
             
         Returns:
             List of documents with source code content and metadata
         """
-        documents = []
+        suffixes = {extension for extension in extensions if extension != 'Makefile'}
+        file_paths = []
         
-        for extension in extensions:
-            if extension == 'Makefile':
-                makefile_path = self.repo_path / 'Makefile'
+        for base_path in self.specific_paths:
+            for root, dirs, files in os.walk(base_path):
+                # Prune the chatbot's own directory so its subtree is never listed
+                dirs[:] = [d for d in dirs if d != 'chatbot']
+                for name in files:
+                    if os.path.splitext(name)[1] in suffixes:
+                        file_paths.append(Path(root, name))
+            
+            if 'Makefile' in extensions:
+                makefile_path = base_path / 'Makefile'
                 if makefile_path.exists():
-                    try:
-                        loader = TextLoader(str(makefile_path))
-                        documents.extend(loader.load())
-                    except Exception as e:
-                        print(f"Error loading {makefile_path}: {e}")
-                continue
-                
-            for file_path in self.repo_path.glob(f"**/*{extension}"):
-                if 'chatbot' in str(file_path):
-                    continue
-                    
-                try:
-                    loader = TextLoader(str(file_path))
-                    documents.extend(loader.load())
-                except Exception as e:
-                    print(f"Error loading {file_path}: {e}")
+                    file_paths.append(makefile_path)
+        
+        documents = []
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for file_documents in executor.map(self._load_file, file_paths):
+                documents.extend(file_documents)
                     
         return documents
         
+    def _load_file(self, file_path: Path) -> List[Dict]:
+        """Load a single file, returning no documents if it cannot be read."""
+        from langchain_core.documents import Document
+        
+        try:
+            content = file_path.read_text(encoding='utf-8', errors='replace')
+            return [Document(page_content=content, metadata={"source": str(file_path)})]
+        except Exception as e:
+            print(f"Error loading {file_path}: {e}")
+            return []
+        
     def split_documents(self, documents: List[Dict], 
                         chunk_size: int = 1000, 
                         chunk_overlap: int = 200) -> List[Dict]:
@@ -66,10 +85,41 @@ class SourceCodeLoader:
         Returns:
             List of document chunks
         """
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=chunk_size,
-            chunk_overlap=chunk_overlap,
-            separators=["\n\n", "\n", " ", ""]
-        )
+        return list(self.iter_split(documents, chunk_size, chunk_overlap))
+        
+    def iter_split(self, documents: Iterable[Dict],
+                   chunk_size: int = 1000,
+                   chunk_overlap: int = 200) -> Iterator[Dict]:
+        """
+        Lazily split documents into chunks, one input document at a time.
+        
+        Only the chunks of the document currently being split are held in
+        memory, so consumers can start embedding before all files are split.
+        
+        Args:
+            documents: Documents to split
+            chunk_size: Maximum size of each chunk
+            chunk_overlap: Overlap between chunks
+            
+        Yields:
+            Document chunks in input order
+        """
+        text_splitter = self._get_splitter(chunk_size, chunk_overlap)
+        
+        for document in documents:
+            yield from text_splitter.split_documents([document])
+            
+    def _get_splitter(self, chunk_size: int, chunk_overlap: int):
+        """Return the text splitter for the given settings, creating it on first use."""
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
         
-        return text_splitter.split_documents(documents)
+        key = (chunk_size, chunk_overlap)
+        text_splitter = self._splitter_cache.get(key)
+        if text_splitter is None:
+            text_splitter = RecursiveCharacterTextSplitter(
+                chunk_size=chunk_size,
+                chunk_overlap=chunk_overlap,
+                separators=["\n\n", "\n", " ", ""]
+            )
+            self._splitter_cache[key] = text_splitter
+        return text_splitter
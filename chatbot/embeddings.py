@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Embedding wrappers used by the vector store.
+"""
+
+import hashlib
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from langchain_core.embeddings import Embeddings
+
+# Stay below SQLite's default limit on host parameters per statement
+_SQLITE_MAX_VARIABLES = 900
+
+# Maximum number of query embeddings kept in memory
+_QUERY_CACHE_SIZE = 2048
+
+class DeduplicatingEmbeddings(Embeddings):
+    """Embeddings wrapper that embeds each distinct text only once."""
+
+    def __init__(self, embeddings: Embeddings):
+        """
+        Initialize the wrapper.
+
+        Args:
+            embeddings: Embedding model that computes the vectors
+        """
+        self.embeddings = embeddings
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed documents, sending duplicate texts to the model only once.
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            One embedding per input text, in input order
+        """
+        unique_texts = list(dict.fromkeys(texts))
+        vectors = dict(zip(unique_texts, self.embeddings.embed_documents(unique_texts)))
+        return [vectors[text] for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        Embed a query.
+
+        Args:
+            text: Query text
+
+        Returns:
+            Embedding of the query
+        """
+        return self.embeddings.embed_query(text)
+
+class ConcurrentEmbeddings(Embeddings):
+    """Embeddings wrapper that sends batches of texts to the model concurrently."""
+
+    def __init__(self, embeddings: Embeddings, batch_size: int, max_workers: int):
+        """
+        Initialize the wrapper.
+
+        Args:
+            embeddings: Embedding model that computes the vectors
+            batch_size: Number of texts per request
+            max_workers: Maximum number of concurrent requests
+        """
+        self.embeddings = embeddings
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed documents, overlapping the requests for the individual batches.
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            One embedding per input text, in input order
+        """
+        batches = [texts[start:start + self.batch_size]
+                   for start in range(0, len(texts), self.batch_size)]
+        if len(batches) <= 1:
+            return self.embeddings.embed_documents(texts)
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(batches))) as executor:
+            results = executor.map(self.embeddings.embed_documents, batches)
+        return [vector for result in results for vector in result]
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        Embed a query.
+
+        Args:
+            text: Query text
+
+        Returns:
+            Embedding of the query
+        """
+        return self.embeddings.embed_query(text)
+
+class EmbeddingCache:
+    """SQLite-backed store of embeddings keyed by model and text hash."""
+
+    def __init__(self, database_path: str):
+        """
+        Initialize the cache. The database file is opened on first use.
+
+        Args:
+            database_path: Path of the SQLite database file
+        """
+        self.database_path = database_path
+        self._connection = None
+        self._connection_lock = threading.Lock()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """Connection to the database, created together with its table on first access."""
+        with self._connection_lock:
+            if self._connection is None:
+                connection = sqlite3.connect(self.database_path, check_same_thread=False)
+                connection.execute(
+                    "CREATE TABLE IF NOT EXISTS embeddings ("
+                    "model TEXT NOT NULL, hash TEXT NOT NULL, vector BLOB NOT NULL, "
+                    "PRIMARY KEY (model, hash))"
+                )
+                self._connection = connection
+            return self._connection
+
+    def get_many(self, model: str, hashes: List[str]) -> Dict[str, List[float]]:
+        """
+        Look up cached embeddings.
+
+        Args:
+            model: Name of the embedding model
+            hashes: Content hashes to look up
+
+        Returns:
+            Mapping from content hash to embedding for the hashes that are cached
+        """
+        found = {}
+        for start in range(0, len(hashes), _SQLITE_MAX_VARIABLES):
+            batch = hashes[start:start + _SQLITE_MAX_VARIABLES]
+            rows = self.connection.execute(
+                f"SELECT hash, vector FROM embeddings WHERE model = ? "
+                f"AND hash IN ({','.join('?' * len(batch))})",
+                [model, *batch]
+            )
+            found.update((digest, array('d', vector).tolist()) for digest, vector in rows)
+        return found
+
+    def set_many(self, model: str, items: Dict[str, List[float]]) -> None:
+        """
+        Store embeddings.
+
+        Args:
+            model: Name of the embedding model
+            items: Mapping from content hash to embedding
+        """
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, hash, vector) VALUES (?, ?, ?)",
+                [(model, digest, array('d', vector).tobytes()) for digest, vector in items.items()]
+            )
+
+class CachedEmbeddings(DeduplicatingEmbeddings):
+    """Embeddings wrapper that reuses embeddings of previously seen texts."""
+
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache, model: str):
+        """
+        Initialize the wrapper.
+
+        Args:
+            embeddings: Embedding model that computes the vectors
+            cache: Cache holding previously computed embeddings
+            model: Name of the embedding model, used as part of the cache key
+        """
+        super().__init__(embeddings)
+        self.cache = cache
+        self.model = model
+        self._query_cache = OrderedDict()
+        self._query_cache_lock = threading.Lock()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed documents, sending only texts without a cached embedding to the model.
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            One embedding per input text, in input order
+        """
+        hashes = [hashlib.sha256(text.encode('utf-8')).hexdigest() for text in texts]
+        vectors = self.cache.get_many(self.model, list(set(hashes)))
+
+        misses = {digest: text for digest, text in zip(hashes, texts) if digest not in vectors}
+        if misses:
+            computed = dict(zip(misses, super().embed_documents(list(misses.values()))))
+            self.cache.set_many(self.model, computed)
+            vectors.update(computed)
+
+        return [vectors[digest] for digest in hashes]
+        
+    def embed_query(self, text: str) -> List[float]:
+        """
+        Embed a query, reusing the embedding of a recently asked identical query.
+        
+        Args:
+            text: Query text
+            
+        Returns:
+            Embedding of the query
+        """
+        with self._query_cache_lock:
+            vector = self._query_cache.get(text)
+            if vector is not None:
+                self._query_cache.move_to_end(text)
+                return list(vector)
+                
+        vector = tuple(super().embed_query(text))
+        
+        with self._query_cache_lock:
+            self._query_cache[text] = vector
+            if len(self._query_cache) > _QUERY_CACHE_SIZE:
+                self._query_cache.popitem(last=False)
+        return list(vector)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Keyword-based intent matching for the pattern-matching chatbots.
+"""
+
+import re
+from typing import Optional, Sequence, Tuple
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+try:
+    import re2
+except ImportError:
+    re2 = None
+
+class IntentMatcher:
+    """Matches user input against prioritized keyword lists."""
+
+    def __init__(self, intents: Sequence[Tuple[str, Sequence[str]]]):
+        """
+        Initialize the matcher.
+
+        Args:
+            intents: (intent name, keywords) pairs, highest priority first
+        """
+        self.intents = tuple(name for name, _ in intents)
+        self._automaton = None
+        self._set = None
+        self._keywords = None
+
+        if ahocorasick is not None:
+            # The intents are plain keyword lists, so an Aho-Corasick automaton
+            # finds every occurrence of every keyword in one walk over the text.
+            # A keyword shared by several intents keeps its best priority.
+            self._automaton = ahocorasick.Automaton()
+            for priority, (_, keywords) in reversed(list(enumerate(intents))):
+                for keyword in keywords:
+                    self._automaton.add_word(keyword, priority)
+            self._automaton.make_automaton()
+            return
+
+        if re2 is not None:
+            # RE2 matches every intent pattern in one linear-time DFA pass and
+            # reports the indices of all patterns that occur in the text.
+            self._set = re2.Set.SearchSet()
+            for _, keywords in intents:
+                self._set.Add("|".join(re.escape(kw) for kw in keywords))
+            self._set.Compile()
+            return
+
+        # Without either package, a substring scan per intent beats a regex
+        # for literal keywords: str.__contains__ is a C-level fast search.
+        self._keywords = tuple(tuple(keywords) for _, keywords in intents)
+
+    def match(self, text: str) -> Optional[str]:
+        """
+        Find the highest-priority intent whose keywords occur in the text.
+
+        Args:
+            text: Normalized (lowercased) user input
+
+        Returns:
+            Name of the matching intent, or None if no keyword occurs
+        """
+        if self._automaton is not None:
+            best = min((priority for _, priority in self._automaton.iter(text)), default=None)
+            return None if best is None else self.intents[best]
+
+        if self._set is not None:
+            hits = self._set.Match(text)
+            return self.intents[min(hits)] if hits else None
+
+        for name, keywords in zip(self.intents, self._keywords):
+            if any(keyword in text for keyword in keywords):
+                return name
+
+        return None
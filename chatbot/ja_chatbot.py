@@ -6,225 +6,302 @@ RAG機能を使用して高度な応答を生成します。
 
 import re
 import sys
-import os
-from dotenv import load_dotenv
+import asyncio
+from collections import ChainMap
 from ja_knowledge_base import JA_KNOWLEDGE_BASE, JA_DETAILED_EXPLANATIONS
 from rag_chatbot import RAGChatbot
+from config import CONFIG
+from intent_matcher import IntentMatcher
 
-load_dotenv()
+INTENTS = (
+    ('project', ('何', 'なに', 'について', '目的', 'プロジェクト', 'リポジトリ', '何ですか')),
+    ('structure', ('コード', '構造', 'ファイル', '組織', '構成')),
+    ('kernel', ('カーネル', '関数', 'creategaussiankernel', '作成', 'ガウス関数')),
+    ('main', ('メイン', 'main', 'エントリー', 'プログラムフロー', '実行')),
+    ('concept', ('概念', 'ガウス', 'ぼかし', 'シグマ', '畳み込み', 'フィルター', '正規化')),
+    ('usage', ('使用', '使い方', '方法', '実行', 'コンパイル', 'ビルド', 'コマンド', '引数')),
+    ('dependency', ('依存', 'opencv', 'ライブラリ', '要件')),
+    ('algorithm', ('アルゴリズム', '詳細', '説明', 'どのように', 'パイプライン', '処理')),
+)
+
+_INTENT_MATCHER = IntentMatcher(INTENTS)
+
+# インテントのキーワードは部分文字列として照合されるため（「ドメイン」は
+# 「メイン」を含むなど）、以下の具体的な語を含む場合にのみRAGを省略します
+_CONFIDENT_KEYWORDS = {
+    'kernel': re.compile(r'creategaussiankernel|ガウスカーネル|カーネル関数'),
+    'main': re.compile(r'\bmain\b|メイン関数|エントリーポイント|プログラムフロー'),
+    'usage': re.compile(r'コンパイル|ビルド|使い方|コマンドライン|引数'),
+    'dependency': re.compile(r'\bopencv\b|依存|ライブラリ'),
+    'algorithm': re.compile(r'アルゴリズム|パイプライン'),
+}
+
+_EXIT_COMMANDS = frozenset({'終了', 'quit', 'bye', 'exit'})
+_HELP_COMMANDS = frozenset({'ヘルプ', 'help', '?'})
+_COMMANDS = _EXIT_COMMANDS | _HELP_COMMANDS
+
+_SEPARATOR = "=" * 80
+_GREETING_TEXT = f"""{_SEPARATOR}
+ガウスフィルターチャットボット（RAG強化版）
+{_SEPARATOR}
+ようこそ！test_cppリポジトリのガウスフィルター実装について理解するお手伝いをします。
+以下について質問できます：
+- プロジェクト構造とファイル
+- ガウスフィルターの仕組み
+- コード実装の詳細
+- ソフトウェアのコンパイルと使用方法
+- カーネル、畳み込みなどの特定の概念
+
+会話を終了するには「終了」、「quit」、または「bye」と入力してください。
+このメッセージをもう一度表示するには「ヘルプ」と入力してください。
+"""
+_STATUS_AZURE = "\n[Azure OpenAIを使用したAI応答機能が有効です]\n"
+_STATUS_OPENAI = "\n[OpenAIを使用したAI応答機能が有効です]\n"
+_STATUS_BASIC = "\n[基本モードで実行中 - AI応答機能を有効にするにはOPENAI_API_KEYまたはAZURE_OPENAI_API_KEYを設定してください]\n"
+
+_PROJECT_TEMPLATE = ("プロジェクト: {name}\n\n"
+                     "説明: {description}\n\n"
+                     "リポジトリ: {repository}\n\n"
+                     "主要ファイル: {files}")
+_FUNCTION_TEMPLATE = ("関数: {name}\n\n"
+                      "目的: {purpose}\n\n"
+                      "パラメータ:\n{parameters}"
+                      "\n戻り値: {return[type]} - {return[description]}\n\n"
+                      "アルゴリズム: {algorithm}\n\n"
+                      "詳細については、「{details}」について質問してください。")
+_DEPENDENCY_TEMPLATE = ("{name}: {description}\n"
+                        "バージョン: {version}\n\n"
+                        "使用されるコンポーネント:\n{components}")
+_FALLBACK_RESPONSE = ("その質問にどう答えるべきかわかりません。プロジェクト、コード構造、"
+                      "ガウスカーネル関数、メイン関数、概念、使用方法、または依存関係について"
+                      "質問できます。詳細については「ヘルプ」と入力してください。")
 
 class GaussianFilterChatbotJa(RAGChatbot):
+    __slots__ = ('_fn_kernel', '_fn_main', '_cached_responses', '_concept_index')
+    
     def __init__(self, repo_path: str = "../"):
         """指定されたリポジトリパスでチャットボットを初期化します。"""
-        super().__init__(repo_path=repo_path, language="ja")
-        self.knowledge_base = JA_KNOWLEDGE_BASE
-        self.detailed_explanations = JA_DETAILED_EXPLANATIONS
+        super().__init__(repo_path=repo_path, language="ja",
+                         knowledge_base=JA_KNOWLEDGE_BASE,
+                         detailed_explanations=JA_DETAILED_EXPLANATIONS)
+        self._fn_kernel = self.knowledge_base['functions']['createGaussianKernel']
+        self._fn_main = self.knowledge_base['functions']['main']
+        self._cached_responses = self._render_static_responses()
+        self._concept_index = self._build_concept_index()
         
     def show_greeting(self):
         """初期挨拶メッセージを表示します。"""
-        print("="*80)
-        print("ガウスフィルターチャットボット（RAG強化版）")
-        print("="*80)
-        print("ようこそ！test_cppリポジトリのガウスフィルター実装について理解するお手伝いをします。")
-        print("以下について質問できます：")
-        print("- プロジェクト構造とファイル")
-        print("- ガウスフィルターの仕組み")
-        print("- コード実装の詳細")
-        print("- ソフトウェアのコンパイルと使用方法")
-        print("- カーネル、畳み込みなどの特定の概念")
-        print("\n会話を終了するには「終了」、「quit」、または「bye」と入力してください。")
-        print("このメッセージをもう一度表示するには「ヘルプ」と入力してください。")
-        
-        if (os.getenv("AZURE_OPENAI_API_KEY") and os.getenv("AZURE_OPENAI_ENDPOINT") and self.llm):
-            print("\n[Azure OpenAIを使用したAI応答機能が有効です]")
-        elif os.getenv("OPENAI_API_KEY") and self.llm:
-            print("\n[OpenAIを使用したAI応答機能が有効です]")
+        self._ensure_llm()
+        if CONFIG.use_azure and self.llm:
+            status = _STATUS_AZURE
+        elif CONFIG.use_openai and self.llm:
+            status = _STATUS_OPENAI
         else:
-            print("\n[基本モードで実行中 - AI応答機能を有効にするにはOPENAI_API_KEYまたはAZURE_OPENAI_API_KEYを設定してください]")
+            status = _STATUS_BASIC
             
-        print("="*80)
+        sys.stdout.write(f"{_GREETING_TEXT}{status}{_SEPARATOR}\n")
+        sys.stdout.flush()
         self.greeting_shown = True
     
+    def _normalize(self, user_input):
+        """ユーザー入力の前後の空白を除去して小文字化します。コマンドはそのまま返します。"""
+        user_input = user_input.strip()
+        if user_input not in _COMMANDS:
+            user_input = user_input.lower()
+        return user_input
+    
     def get_response_with_pattern_matching(self, user_input):
-        """パターンマッチングを使用してユーザー入力を処理し、応答を生成します。"""
-        user_input = user_input.lower().strip()
-        
-        if user_input in ['終了', 'quit', 'bye', 'exit']:
-            return "さようなら！ガウスフィルター実装の理解にお役に立てれば幸いです。"
+        """パターンマッチングを使用してユーザー入力を処理し、応答を生成します。一致しない場合はNoneを返します。"""
+        return self._get_pattern_response(self._normalize(user_input))[1]
+    
+    def _get_pattern_response(self, user_input):
+        """正規化済みの入力をパターンマッチングし、インテントと応答（なければNone）を返します。"""
+        if user_input in _EXIT_COMMANDS:
+            return None, "さようなら！ガウスフィルター実装の理解にお役に立てれば幸いです。"
         
-        if user_input in ['ヘルプ', 'help', '?']:
+        if user_input in _HELP_COMMANDS:
             self.show_greeting()
-            return ""
+            return None, ""
         
-        if re.search(r'何|なに|について|目的|プロジェクト|リポジトリ|何ですか', user_input):
-            return self._get_project_info()
+        intent = _INTENT_MATCHER.match(user_input)
         
-        if re.search(r'コード|構造|ファイル|組織|構成', user_input):
-            return self._get_code_structure()
+        if intent == 'concept':
+            return intent, self._get_concept_info(user_input)
         
-        if re.search(r'カーネル|関数|creategaussiankernel|作成|ガウス関数', user_input):
-            return self._get_kernel_function_info()
+        if intent in self._cached_responses:
+            return intent, self._cached_responses[intent]
         
-        if re.search(r'メイン|main|エントリー|プログラムフロー|実行', user_input):
-            return self._get_main_function_info()
+        if intent == 'algorithm':
+            if 'カーネル' in user_input or 'ガウス' in user_input:
+                return intent, self.detailed_explanations['gaussian_kernel_algorithm']
+            if 'パイプライン' in user_input or '処理' in user_input or '画像' in user_input:
+                return intent, self.detailed_explanations['image_processing_pipeline']
         
-        if re.search(r'概念|ガウス|ぼかし|シグマ|畳み込み|フィルター|正規化', user_input):
-            return self._get_concept_info(user_input)
+        return intent, None
+                
+    async def aget_response(self, user_input, on_token=None):
+        """ユーザー入力に対する応答を非同期に取得し、RAGの回答をon_tokenでストリーミングします。"""
+        user_input = self._normalize(user_input)
         
-        if re.search(r'使用|使い方|方法|実行|コンパイル|ビルド|コマンド|引数', user_input):
-            return self._get_usage_info()
+        if user_input in _EXIT_COMMANDS:
+            return "さようなら！ガウスフィルター実装の理解にお役に立てれば幸いです。"
         
-        if re.search(r'依存|opencv|ライブラリ|要件', user_input):
-            return self._get_dependency_info()
+        if user_input in _HELP_COMMANDS:
+            self.show_greeting()
+            return ""
         
-        if re.search(r'アルゴリズム|詳細|説明|どのように|パイプライン|処理', user_input):
-            if 'カーネル' in user_input or 'ガウス' in user_input:
-                return self.detailed_explanations['gaussian_kernel_algorithm']
-            if 'パイプライン' in user_input or '処理' in user_input or '画像' in user_input:
-                return self.detailed_explanations['image_processing_pipeline']
+        return await super().aget_response(user_input, on_token) or _FALLBACK_RESPONSE
         
-        return ("その質問にどう答えるべきかわかりません。プロジェクト、コード構造、"
-                "ガウスカーネル関数、メイン関数、概念、使用方法、または依存関係について"
-                "質問できます。詳細については「ヘルプ」と入力してください。")
-                
     def get_response(self, user_input):
         """ユーザー入力に対する応答を取得し、可能であればRAGを使用します。"""
-        user_input = user_input.lower().strip()
+        user_input = self._normalize(user_input)
         
-        if user_input in ['終了', 'quit', 'bye', 'exit']:
+        if user_input in _EXIT_COMMANDS:
             return "さようなら！ガウスフィルター実装の理解にお役に立てれば幸いです。"
         
-        if user_input in ['ヘルプ', 'help', '?']:
+        if user_input in _HELP_COMMANDS:
             self.show_greeting()
             return ""
         
-        agent_response = self.get_response_with_agent(user_input)
-        if agent_response:
-            return agent_response
-            
-        rag_response = self.get_response_with_rag(user_input)
-        if not rag_response:
-            return self.get_response_with_pattern_matching(user_input)
-            
-        return rag_response
+        return super().get_response(user_input) or _FALLBACK_RESPONSE
+    
+    def _pattern_is_confident(self, user_input, intent, response):
+        """パターンマッチングの回答がRAGを省略できるほど具体的かどうかを判定します。"""
+        if intent == 'concept':
+            return response != self._cached_responses['concept']
+        keywords = _CONFIDENT_KEYWORDS.get(intent)
+        return keywords is not None and keywords.search(user_input) is not None
+    
+    def _render_static_responses(self):
+        """静的なナレッジベースのみに依存する応答を事前に生成します。"""
+        return {
+            'project': self._get_project_info(),
+            'structure': self._get_code_structure(),
+            'kernel': self._get_kernel_function_info(),
+            'main': self._get_main_function_info(),
+            'concept': self._get_concepts_overview(),
+            'usage': self._get_usage_info(),
+            'dependency': self._get_dependency_info(),
+        }
     
     def _get_project_info(self):
         """プロジェクトに関する情報を取得します。"""
         project = self.knowledge_base['project']
-        return (f"プロジェクト: {project['name']}\n\n"
-                f"説明: {project['description']}\n\n"
-                f"リポジトリ: {project['repository']}\n\n"
-                f"主要ファイル: {', '.join(project['files'])}")
+        return _PROJECT_TEMPLATE.format_map(ChainMap({'files': ', '.join(project['files'])}, project))
     
     def _get_code_structure(self):
         """コード構造に関する情報を取得します。"""
         structure = self.knowledge_base['code_structure']
-        result = "コード構造:\n\n"
-        for file, description in structure.items():
-            result += f"• {file}: {description}\n"
-        return result
+        parts = ["コード構造:\n\n"]
+        parts.extend(f"• {file}: {description}\n" for file, description in structure.items())
+        return "".join(parts)
     
     def _get_kernel_function_info(self):
         """ガウスカーネル関数に関する情報を取得します。"""
-        func = self.knowledge_base['functions']['createGaussianKernel']
-        
-        result = f"関数: createGaussianKernel\n\n"
-        result += f"目的: {func['purpose']}\n\n"
-        
-        result += "パラメータ:\n"
-        for param in func['parameters']:
-            result += f"• {param['name']} ({param['type']}): {param['description']}\n"
-        
-        result += f"\n戻り値: {func['return']['type']} - {func['return']['description']}\n\n"
-        result += f"アルゴリズム: {func['algorithm']}\n\n"
-        result += f"詳細については、「ガウスカーネルアルゴリズム」について質問してください。"
-        
-        return result
+        return self._format_function('createGaussianKernel', self._fn_kernel, 'ガウスカーネルアルゴリズム')
     
     def _get_main_function_info(self):
         """メイン関数に関する情報を取得します。"""
-        func = self.knowledge_base['functions']['main']
-        
-        result = f"関数: main\n\n"
-        result += f"目的: {func['purpose']}\n\n"
-        
-        result += "パラメータ:\n"
-        for param in func['parameters']:
-            result += f"• {param['name']} ({param['type']}): {param['description']}\n"
-        
-        result += f"\n戻り値: {func['return']['type']} - {func['return']['description']}\n\n"
-        result += f"アルゴリズム: {func['algorithm']}\n\n"
-        result += f"詳細については、「画像処理パイプライン」について質問してください。"
-        
-        return result
+        return self._format_function('main', self._fn_main, '画像処理パイプライン')
+    
+    def _format_function(self, name, func, details):
+        """ナレッジベースの関数エントリを整形します。"""
+        parameters = "".join(f"• {param['name']} ({param['type']}): {param['description']}\n"
+                             for param in func['parameters'])
+        return _FUNCTION_TEMPLATE.format_map(
+            ChainMap({'name': name, 'parameters': parameters, 'details': details}, func))
     
     def _get_concept_info(self, user_input):
         """概念に関する情報を取得します。"""
-        concepts = self.knowledge_base['concepts']
+        for name, response in self._concept_index.items():
+            if name in user_input:
+                return response
         
-        for concept, description in concepts.items():
-            if concept.replace('_', ' ') in user_input:
-                return f"{concept.replace('_', ' ')}: {description}"
+        return self._cached_responses['concept']
+    
+    def _build_concept_index(self):
+        """正規化された概念名を事前に生成した回答に対応付けます。"""
+        return {
+            concept.replace('_', ' ').lower(): f"{concept.replace('_', ' ')}: {description}"
+            for concept, description in self.knowledge_base['concepts'].items()
+        }
+    
+    def _get_concepts_overview(self):
+        """すべての概念の概要を取得します。"""
+        concepts = self.knowledge_base['concepts']
         
-        result = "ガウス画像フィルタリングの概念:\n\n"
-        for concept, description in concepts.items():
-            result += f"• {concept.replace('_', ' ')}: {description}\n\n"
+        parts = ["ガウス画像フィルタリングの概念:\n\n"]
+        parts.extend(f"• {concept.replace('_', ' ')}: {description}\n\n"
+                     for concept, description in concepts.items())
         
-        return result
+        return "".join(parts)
     
     def _get_usage_info(self):
         """使用方法に関する情報を取得します。"""
         usage = self.knowledge_base['usage']
         
-        result = "ガウスフィルターの使用方法:\n\n"
-        result += f"コンパイル: {usage['compilation']}\n\n"
-        result += f"実行: {usage['execution']}\n\n"
-        
-        result += "コマンドライン引数:\n"
-        for arg in usage['command_line_args']:
-            result += f"• {arg['name']}: {arg['description']}\n"
-        
-        result += "\n例:\n"
-        for example in usage['examples']:
-            result += f"• {example['command']}\n  {example['description']}\n"
+        args = "".join(f"• {arg['name']}: {arg['description']}\n"
+                       for arg in usage['command_line_args'])
+        examples = "".join(f"• {example['command']}\n  {example['description']}\n"
+                           for example in usage['examples'])
         
-        return result
+        return (f"ガウスフィルターの使用方法:\n\n"
+                f"コンパイル: {usage['compilation']}\n\n"
+                f"実行: {usage['execution']}\n\n"
+                f"コマンドライン引数:\n{args}"
+                f"\n例:\n{examples}")
     
     def _get_dependency_info(self):
         """依存関係に関する情報を取得します。"""
         deps = self.knowledge_base['dependencies']
         
-        result = "依存関係:\n\n"
+        parts = ["依存関係:\n\n"]
         for _, dep in deps.items():
-            result += f"{dep['name']}: {dep['description']}\n"
-            result += f"バージョン: {dep['version']}\n\n"
-            
-            result += "使用されるコンポーネント:\n"
-            for comp in dep['components_used']:
-                result += f"• {comp['name']}: {comp['purpose']}\n"
+            components = "".join(f"• {comp['name']}: {comp['purpose']}\n"
+                                 for comp in dep['components_used'])
+            parts.append(_DEPENDENCY_TEMPLATE.format_map(ChainMap({'components': components}, dep)))
         
-        return result
+        return "".join(parts)
     
     def run(self):
-        """チャットボットをインタラクティブモードで実行します。"""
+        """チャットボットをインタラクティブモードで実行し、RAGの回答を生成に合わせてストリーミング表示します。"""
         self.show_greeting()
         
+        # 言語モデルの非同期HTTPクライアントが同じループに結び付いたままになるよう、
+        # すべてのターンで1つのイベントループを使います。asyncio.runと異なり
+        # run_until_complete はSIGINTハンドラーを登録しないため、Ctrl-Cで
+        # KeyboardInterruptが発生します
+        loop = asyncio.new_event_loop()
         try:
             while True:
                 user_input = input("\nあなた: ").strip()
                 if not user_input:
                     continue
                 
-                response = self.get_response(user_input)
-                if response:
+                streamed = []
+                
+                def print_token(token):
+                    if not streamed:
+                        print("\nチャットボット: ", end="")
+                    streamed.append(token)
+                    print(token, end="", flush=True)
+                    
+                response = loop.run_until_complete(
+                    self.aget_response(user_input, on_token=print_token)
+                )
+                if streamed:
+                    print()
+                elif response:
                     print(f"\nチャットボット: {response}")
                 
-                if user_input.lower() in ['終了', 'quit', 'bye', 'exit']:
+                if user_input.lower() in _EXIT_COMMANDS:
                     break
         except KeyboardInterrupt:
             print("\n\nさようなら！ガウスフィルター実装の理解にお役に立てれば幸いです。")
         except Exception as e:
             print(f"\nエラーが発生しました: {e}")
+        finally:
+            loop.close()
 
 if __name__ == "__main__":
     chatbot = GaussianFilterChatbotJa()
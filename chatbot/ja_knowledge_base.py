@@ -3,6 +3,8 @@
 コードベース、概念、機能に関する情報を含みます。
 """
 
+from knowledge_base import freeze
+
 JA_KNOWLEDGE_BASE = {
     "project": {
         "name": "ガウスフィルター",
@@ -110,3 +112,6 @@ filter2D関数は次の方法で畳み込みを実行します：
 - 画像内のすべてのピクセルに対してこれを繰り返します
     """
 }
+
+JA_KNOWLEDGE_BASE = freeze(JA_KNOWLEDGE_BASE)
+JA_DETAILED_EXPLANATIONS = freeze(JA_DETAILED_EXPLANATIONS)
@@ -3,6 +3,9 @@ Knowledge base for the Gaussian filter chatbot.
 Contains information about the codebase, concepts, and functionality.
 """
 
+import sys
+from types import MappingProxyType
+
 KNOWLEDGE_BASE = {
     "project": {
         "name": "Gaussian Filter",
@@ -111,3 +114,23 @@ The filter2D function performs convolution by:
 - Repeating for all pixels in the image
     """
 }
+
+def freeze(obj):
+    """
+    Recursively intern dictionary keys, wrap dictionaries in read-only proxies
+    and convert lists to tuples.
+    
+    Args:
+        obj: Knowledge base value to freeze
+        
+    Returns:
+        The frozen value
+    """
+    if isinstance(obj, dict):
+        return MappingProxyType({sys.intern(key): freeze(value) for key, value in obj.items()})
+    if isinstance(obj, list):
+        return tuple(freeze(value) for value in obj)
+    return obj
+
+KNOWLEDGE_BASE = freeze(KNOWLEDGE_BASE)
+DETAILED_EXPLANATIONS = freeze(DETAILED_EXPLANATIONS)
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Conversation memory with a bounded token footprint.
+"""
+
+from typing import Optional
+
+from langchain.memory import ConversationSummaryBufferMemory
+from langchain_core.prompts import PromptTemplate
+
+_CONDENSE_PROMPT = PromptTemplate.from_template(
+    "Condense the following conversation summary to at most {max_tokens} tokens, "
+    "keeping the key facts and the topics that were discussed.\n\n"
+    "Summary:\n{summary}\n\n"
+    "Condensed summary:"
+)
+
+class BoundedSummaryBufferMemory(ConversationSummaryBufferMemory):
+    """
+    Summary buffer memory whose running summary is kept bounded as well.
+
+    ConversationSummaryBufferMemory only bounds the verbatim turns; the running
+    summary keeps growing as more turns are folded into it. This class condenses
+    the summary again whenever it exceeds half of max_token_limit.
+    """
+
+    def prune(self) -> None:
+        """Prune the buffer and condense the running summary if it grew too large."""
+        super().prune()
+        
+        prompt = self._condense_prompt()
+        if prompt is not None:
+            self.moving_summary_buffer = self.llm.invoke(prompt).content
+            
+    async def aprune(self) -> None:
+        """Asynchronously prune the buffer and condense the running summary if it grew too large."""
+        await super().aprune()
+        
+        prompt = self._condense_prompt()
+        if prompt is not None:
+            self.moving_summary_buffer = (await self.llm.ainvoke(prompt)).content
+            
+    def _condense_prompt(self) -> Optional[str]:
+        """
+        Build the prompt that condenses the running summary.
+        
+        Returns:
+            The prompt, or None if the summary is within half of max_token_limit
+        """
+        max_summary_tokens = self.max_token_limit // 2
+        if not self.moving_summary_buffer or \
+                self.llm.get_num_tokens(self.moving_summary_buffer) <= max_summary_tokens:
+            return None
+            
+        return _CONDENSE_PROMPT.format(max_tokens=max_summary_tokens,
+                                       summary=self.moving_summary_buffer)
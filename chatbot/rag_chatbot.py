@@ -5,120 +5,353 @@ Base class for RAG-enhanced Gaussian Filter chatbot.
 
 import os
 import re
-from typing import List, Dict, Optional
-from dotenv import load_dotenv
-from pathlib import Path
+import json
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Dict, Optional, Tuple
 
-if os.getenv("HTTP_PROXY"):
-    os.environ["HTTP_PROXY"] = os.getenv("HTTP_PROXY")
-if os.getenv("HTTPS_PROXY"):
-    os.environ["HTTPS_PROXY"] = os.getenv("HTTPS_PROXY")
-if os.getenv("NO_PROXY"):
-    os.environ["NO_PROXY"] = os.getenv("NO_PROXY")
+# LangChain, the OpenAI clients and the vector store are imported where they
+# are used, so the pattern-matching and agent paths start without them
+from config import CONFIG
+from knowledge_base import KNOWLEDGE_BASE, DETAILED_EXPLANATIONS
 
-from langchain_openai import ChatOpenAI, AzureChatOpenAI
-from langchain.chains import ConversationalRetrievalChain
-from langchain.memory import ConversationBufferMemory
+__all__ = ["RAGChatbot"]
 
-from vector_store import VectorStore
-from document_loader import SourceCodeLoader
-from knowledge_base import KNOWLEDGE_BASE, DETAILED_EXPLANATIONS
+_SYSTEM_INSTRUCTIONS = {
+    "en": ("You are an assistant that explains the Gaussian filter implementation in the "
+           "test_cpp repository. Answer the question using the knowledge base below and "
+           "the retrieved source code. If the answer is not there, say that you don't know."),
+    "ja": ("あなたはtest_cppリポジトリのガウシアンフィルタ実装を説明するアシスタントです。"
+           "以下のナレッジベースと検索されたソースコードを使って、日本語で質問に答えてください。"
+           "答えが見つからない場合は、わからないと答えてください。"),
+}
+
+_LINE_COUNT_EN = re.compile(
+    r'how many (line|code)|(line|code).*(count|number)|(count|tell me).*(line|code)',
+    re.IGNORECASE
+)
+_LINE_COUNT_JA = re.compile(r'(行数|コード|ソース|ソフトウエア).*(数|教えて|カウント|数える)')
 
-load_dotenv()
+# ASCII words, or runs of other word characters such as kana and kanji
+_JA_TOKEN = re.compile(r'[0-9a-z_]+|[^\W0-9a-z_]+')
+
+def _tokenize_ja(text: str) -> List[str]:
+    """
+    Split Japanese text into terms for BM25.
+    
+    Japanese is written without spaces, so runs of Japanese characters are
+    split into overlapping character bigrams. ASCII words such as identifiers
+    are kept whole.
+    
+    Args:
+        text: Text to tokenize
+        
+    Returns:
+        List of terms
+    """
+    terms = []
+    for token in _JA_TOKEN.findall(text.lower()):
+        if token.isascii() or len(token) == 1:
+            terms.append(token)
+        else:
+            terms.extend(token[i:i + 2] for i in range(len(token) - 1))
+    return terms
+
+_READ_BUFFER_SIZE = 1 << 20
+
+def _count_file_lines(path) -> int:
+    """
+    Count the lines of a file without loading it into memory.
+    
+    Args:
+        path: Path to the file
+        
+    Returns:
+        Number of lines, counting a final line without a trailing newline
+    """
+    lines = 0
+    last = b'\n'
+    with open(path, 'rb', buffering=0) as f:
+        for buf in iter(lambda: f.read(_READ_BUFFER_SIZE), b''):
+            lines += buf.count(b'\n')
+            last = buf[-1:]
+    return lines if last == b'\n' else lines + 1
 
 class RAGChatbot:
     """Base class for RAG-enhanced Gaussian Filter chatbot."""
     
-    def __init__(self, repo_path: str = "../", language: str = "en"):
+    __slots__ = ('repo_path', 'language', 'knowledge_base', 'detailed_explanations',
+                 'greeting_shown', 'prompt', 'vector_store', 'llm', 'chain', 'memory',
+                 '_line_count_cache', '_llm_ready')
+    
+    def __init__(self, repo_path: str = "../", language: str = "en",
+                 knowledge_base: Dict = KNOWLEDGE_BASE,
+                 detailed_explanations: Dict = DETAILED_EXPLANATIONS):
         """
         Initialize the RAG chatbot.
         
         Args:
             repo_path: Path to the repository
             language: Language for the chatbot (en or ja)
+            knowledge_base: Knowledge base for the chatbot language
+            detailed_explanations: Detailed explanations for the chatbot language
         """
         self.repo_path = repo_path
         self.language = language
-        self.knowledge_base = KNOWLEDGE_BASE
-        self.detailed_explanations = DETAILED_EXPLANATIONS
+        self.knowledge_base = knowledge_base
+        self.detailed_explanations = detailed_explanations
         self.greeting_shown = False
+        self.prompt = None
+        self._line_count_cache = None
         
-        db_dir = os.getenv("CHROMA_DB_DIRECTORY", "./chroma_db")
+        from vector_store import VectorStore
         self.vector_store = VectorStore(
-            f"{db_dir}_{language}", 
-            embedding_model=os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+            f"{CONFIG.chroma_db_directory}_{language}", 
+            embedding_model=CONFIG.embedding_model
         )
         
+        # The language model and the chain are set up by _ensure_llm on first use
         self.llm = None
         self.chain = None
         self.memory = None
-        if os.getenv("AZURE_OPENAI_API_KEY") and os.getenv("AZURE_OPENAI_ENDPOINT"):
-            self.setup_llm_azure()
-        elif os.getenv("OPENAI_API_KEY"):
-            self.setup_llm()
+        self._llm_ready = False
         
         self.initialize_vector_store()
         
+    def _ensure_llm(self):
+        """Set up the LLM cache, the language model and the chain on first use."""
+        if self._llm_ready:
+            return
+            
+        try:
+            if CONFIG.use_azure:
+                self.setup_llm_cache()
+                self.setup_llm_azure()
+            elif CONFIG.use_openai:
+                self.setup_llm_cache()
+                self.setup_llm()
+        except Exception as e:
+            # Fall back to the other handlers and try again on the next question
+            print(f"Error setting up the language model: {e}")
+            self.llm = None
+            self.chain = None
+            self.memory = None
+            return
+            
+        self._llm_ready = True
+            
+    def setup_llm_cache(self):
+        """
+        Set up the global LLM response cache selected by LLM_CACHE_BACKEND.
+        
+        Supported backends are "sqlite" (default, stored in LLM_CACHE_DB),
+        "redis" for exact matches and "redis-semantic", which also answers
+        paraphrased questions using the vector store embeddings. "none"
+        disables the cache.
+        """
+        from langchain_core.globals import set_llm_cache
+        
+        backend = CONFIG.llm_cache_backend
+        
+        try:
+            if backend == "sqlite":
+                from langchain_community.cache import SQLiteCache
+                set_llm_cache(SQLiteCache(database_path=CONFIG.llm_cache_db))
+            elif backend == "redis":
+                from langchain_community.cache import RedisCache
+                from redis import Redis
+                set_llm_cache(RedisCache(redis_=Redis.from_url(CONFIG.redis_url)))
+            elif backend == "redis-semantic":
+                from langchain_community.cache import RedisSemanticCache
+                set_llm_cache(RedisSemanticCache(
+                    redis_url=CONFIG.redis_url,
+                    embedding=self.vector_store.embeddings
+                ))
+        except Exception as e:
+            print(f"Error setting up LLM cache: {e}")
+            
     def setup_llm(self):
         """Set up the language model and conversation chain."""
+        from langchain_openai import ChatOpenAI
+        
         self.llm = ChatOpenAI(
-            model_name=os.getenv("LLM_MODEL", "gpt-3.5-turbo"),
-            temperature=0.5
+            model_name=CONFIG.llm_model,
+            temperature=0.5,
+            streaming=True
         )
         
-        self.memory = ConversationBufferMemory(
-            memory_key="chat_history",
-            return_messages=True
-        )
+        self.memory = self._build_memory()
         
         if not self.vector_store.db:
             if not self.vector_store.load_existing_index():
                 print("Warning: No vector index available. Running with limited capabilities.")
                 return
         
-        self.chain = ConversationalRetrievalChain.from_llm(
-            llm=self.llm,
-            retriever=self.vector_store.db.as_retriever(),
-            memory=self.memory
-        )
+        self._create_chain()
         
     def setup_llm_azure(self):
         """Set up the Azure OpenAI language model and conversation chain."""
         try:
+            from langchain_openai import AzureChatOpenAI
+            
             self.llm = AzureChatOpenAI(
-                azure_deployment=os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME", "chat"),
-                azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-                api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-                api_version=os.getenv("AZURE_OPENAI_API_VERSION", "2023-05-15"),
-                temperature=0.5
+                azure_deployment=CONFIG.azure_openai_deployment_name,
+                azure_endpoint=CONFIG.azure_openai_endpoint,
+                api_key=CONFIG.azure_openai_api_key,
+                api_version=CONFIG.azure_openai_api_version,
+                temperature=0.5,
+                streaming=True
             )
             
-            self.memory = ConversationBufferMemory(
-                memory_key="chat_history",
-                return_messages=True
-            )
+            self.memory = self._build_memory()
             
             if not self.vector_store.db:
                 if not self.vector_store.load_existing_index():
                     print("Warning: No vector index available. Running with limited capabilities.")
                     return
             
-            self.chain = ConversationalRetrievalChain.from_llm(
-                llm=self.llm,
-                retriever=self.vector_store.db.as_retriever(),
-                memory=self.memory
-            )
+            self._create_chain()
         except Exception as e:
             print(f"Error setting up Azure OpenAI: {e}")
             
+    def _create_chain(self):
+        """Create the conversation chain from the language model and memory."""
+        from langchain.chains import ConversationalRetrievalChain
+        
+        if self.prompt is None:
+            self.prompt = self._build_prompt()
+            
+        self.chain = ConversationalRetrievalChain.from_llm(
+            llm=self.llm,
+            retriever=self._build_retriever(),
+            memory=self.memory,
+            combine_docs_chain_kwargs={"prompt": self.prompt}
+        )
+        
+    def _build_memory(self):
+        """
+        Build the conversation memory for the chain.
+        
+        Recent turns are kept verbatim and older ones are summarized, so the
+        history sent with each question stays within MEMORY_MAX_TOKENS.
+        
+        Returns:
+            Conversation memory bound to the current language model
+        """
+        from memory import BoundedSummaryBufferMemory
+        
+        return BoundedSummaryBufferMemory(
+            llm=self.llm,
+            memory_key="chat_history",
+            return_messages=True,
+            max_token_limit=CONFIG.memory_max_tokens
+        )
+        
+    def _build_prompt(self):
+        """
+        Build the answer prompt for the conversation chain.
+        
+        The knowledge base is serialized once into a fixed system message that
+        leads every request, so the provider's prompt cache can reuse it. The
+        retrieved code and the question follow as the only varying part.
+        
+        Returns:
+            Chat prompt taking the retrieved context and the question
+        """
+        from langchain_core.messages import SystemMessage
+        from langchain_core.prompts import ChatPromptTemplate
+        
+        knowledge_base = json.dumps(self.knowledge_base, default=dict, ensure_ascii=False)
+        detailed_explanations = "\n".join(self.detailed_explanations.values())
+        system_prompt = (
+            f"{_SYSTEM_INSTRUCTIONS[self.language]}\n\n"
+            f"Knowledge base:\n{knowledge_base}\n\n"
+            f"Detailed explanations:\n{detailed_explanations}"
+        )
+        return ChatPromptTemplate.from_messages([
+            SystemMessage(content=system_prompt),
+            ("human", "Source code context:\n{context}\n\nQuestion: {question}")
+        ])
+        
+    def _build_retriever(self):
+        """
+        Build a hybrid retriever combining BM25 keyword search with dense search,
+        followed by a cross-encoder rerank stage.
+        
+        BM25 catches exact identifiers such as filter2D or sigmaX that dense
+        embeddings tend to blur. The weights come from HYBRID_SPARSE_WEIGHT and
+        HYBRID_DENSE_WEIGHT. The dense side uses MMR so that adjacent chunks of
+        the same file do not crowd out other passages. Both retrievers over-fetch
+        RERANK_FETCH_K candidates and the cross-encoder keeps the best RERANK_TOP_N
+        for the LLM.
+        
+        Returns:
+            Retriever over the indexed document chunks
+        """
+        from langchain.retrievers import ContextualCompressionRetriever, EnsembleRetriever
+        from langchain.retrievers.document_compressors import CrossEncoderReranker
+        from langchain_community.retrievers import BM25Retriever
+        from reranker import LazyCrossEncoder
+        
+        fetch_k = CONFIG.rerank_fetch_k
+        retriever = self.vector_store.db.as_retriever(
+            search_type="mmr",
+            search_kwargs={
+                "k": fetch_k,
+                "fetch_k": max(CONFIG.mmr_fetch_k, fetch_k),
+                "lambda_mult": CONFIG.mmr_lambda_mult
+            }
+        )
+        
+        documents = self.vector_store.get_documents()
+        if documents:
+            # Japanese queries share no whitespace-separated words with the text
+            bm25_kwargs = {"preprocess_func": _tokenize_ja} if self.language == "ja" else {}
+            sparse_retriever = BM25Retriever.from_documents(documents, k=fetch_k, **bm25_kwargs)
+            retriever = EnsembleRetriever(
+                retrievers=[sparse_retriever, retriever],
+                weights=[
+                    CONFIG.hybrid_sparse_weight,
+                    CONFIG.hybrid_dense_weight
+                ]
+            )
+            
+        reranker = CrossEncoderReranker(
+            model=LazyCrossEncoder(CONFIG.rerank_model_ja if self.language == "ja" else CONFIG.rerank_model),
+            top_n=CONFIG.rerank_top_n
+        )
+        return ContextualCompressionRetriever(base_compressor=reranker, base_retriever=retriever)
+            
+    def _index_fingerprint(self) -> str:
+        """
+        Fingerprint the indexed source files and the embedding model.
+        
+        Returns:
+            Hex digest of the embedding model and the path, modification time and
+            size of each source file
+        """
+        signature = (self.vector_store.embeddings.model,
+                     sorted(self._source_signature(self._find_source_files())))
+        return hashlib.blake2b(repr(signature).encode('utf-8'), digest_size=16).hexdigest()
+        
     def initialize_vector_store(self):
         """Initialize the vector store with repository documents if not already done."""
-        force_reindex = os.getenv("FORCE_REINDEX", "False").lower() in ("true", "1", "yes")
+        # The sources are fingerprinted before they are read, so a file edited
+        # during indexing does not match the manifest on the next start
+        fingerprint = self._index_fingerprint()
         
-        if not force_reindex and self.vector_store.load_existing_index():
-            print(f"Using existing vector index in {self.vector_store.persist_directory}")
-            return
+        if not CONFIG.force_reindex:
+            # An index built from the current sources is opened on first retrieval
+            if self.vector_store.manifest_matches(fingerprint):
+                self.vector_store.defer_load()
+                print(f"Using existing vector index in {self.vector_store.persist_directory}")
+                return
+            if self.vector_store.load_existing_index():
+                print(f"Using existing vector index in {self.vector_store.persist_directory}")
+                return
             
+        from document_loader import SourceCodeLoader
+        
         print(f"Creating new vector index in {self.vector_store.persist_directory}")
         loader = SourceCodeLoader(self.repo_path)
         documents = loader.load_source_files()
@@ -134,14 +367,10 @@ class RAGChatbot:
             return
             
         print(f"Indexing {len(chunks)} document chunks...")
-        self.vector_store.index_documents(chunks)
+        self.vector_store.index_documents(chunks, batch_size=CONFIG.chroma_batch_size)
+        self.vector_store.write_manifest(fingerprint, len(chunks))
         print(f"Indexed {len(chunks)} document chunks in vector store: {self.vector_store.persist_directory}")
         
-        if not self.llm:
-            if os.getenv("AZURE_OPENAI_API_KEY") and os.getenv("AZURE_OPENAI_ENDPOINT"):
-                self.setup_llm_azure()
-            elif os.getenv("OPENAI_API_KEY"):
-                self.setup_llm()
     def get_response_with_rag(self, user_input: str) -> str:
         """
         Get response using RAG if available.
@@ -152,6 +381,7 @@ class RAGChatbot:
         Returns:
             Response string from the LLM
         """
+        self._ensure_llm()
         if not self.chain:
             return None
             
@@ -161,6 +391,41 @@ class RAGChatbot:
         except Exception as e:
             print(f"Error getting response with RAG: {e}")
             return None
+            
+    async def aget_response_with_rag(self, user_input: str,
+                                     on_token: Optional[Callable[[str], None]] = None) -> str:
+        """
+        Get response using RAG if available, streaming the answer as it is generated.
+        
+        Args:
+            user_input: User's input text
+            on_token: Callback receiving each token of the answer
+            
+        Returns:
+            Response string from the LLM
+        """
+        self._ensure_llm()
+        if not self.chain:
+            return None
+            
+        try:
+            # Only tokens of the answering step are streamed, not those of the
+            # question rewriting step that runs when there is chat history
+            answer_chain = self.chain.combine_docs_chain.get_name()
+            answer_runs = set()
+            answer = None
+            async for event in self.chain.astream_events({"question": user_input}, version="v2"):
+                if event["event"] == "on_chain_start" and event["name"] == answer_chain:
+                    answer_runs.add(event["run_id"])
+                elif event["event"] == "on_chat_model_stream":
+                    if on_token and answer_runs.intersection(event["parent_ids"]):
+                        on_token(event["data"]["chunk"].content)
+                elif event["event"] == "on_chain_end" and not event["parent_ids"]:
+                    answer = event["data"]["output"]["answer"]
+            return answer
+        except Exception as e:
+            print(f"Error getting response with RAG: {e}")
+            return None
     
     def get_response_with_pattern_matching(self, user_input: str) -> str:
         """
@@ -170,7 +435,22 @@ class RAGChatbot:
             user_input: User's input text
             
         Returns:
-            Response string from pattern matching
+            Response string from pattern matching, or None if no pattern matches
+        """
+        raise NotImplementedError("Subclasses must implement this method.")
+        
+    def _get_pattern_response(self, user_input: str) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Match input against the patterns (to be implemented by subclasses).
+        
+        The routing calls this hook with input that the subclass has already
+        normalized, so each question is normalized and matched only once.
+        
+        Args:
+            user_input: Normalized user input
+            
+        Returns:
+            The matched intent and the response, each None if there is none
         """
         raise NotImplementedError("Subclasses must implement this method.")
         
@@ -195,46 +475,92 @@ class RAGChatbot:
     def _is_line_count_question(self, user_input: str) -> bool:
         """Check if the question is about code line count."""
         if self.language == "ja":
-            return re.search(r'(行数|コード|ソース|ソフトウエア).*(数|教えて|カウント|数える)', user_input.lower()) is not None
+            return _LINE_COUNT_JA.search(user_input) is not None
         else:  # en
-            if re.search(r'how many (line|code)', user_input.lower()) is not None:
-                return True
-            if re.search(r'(line|code).*(count|number)', user_input.lower()) is not None:
-                return True
-            if re.search(r'(count|tell me).*(line|code)', user_input.lower()) is not None:
-                return True
-            return False
+            return _LINE_COUNT_EN.search(user_input) is not None
+            
+    def _find_source_files(self) -> List[tuple]:
+        """
+        Find the source files whose lines are counted.
+        
+        Returns:
+            List of (display name, path) pairs
+        """
+        cpp_files = []
+        header_files = []
+        for root, dirs, files in os.walk(self.repo_path):
+            dirs[:] = [d for d in dirs if d != 'chatbot']
+            for file in files:
+                if file.endswith('.cpp'):
+                    cpp_files.append(os.path.join(root, file))
+                elif file.endswith('.h'):
+                    header_files.append(os.path.join(root, file))
+                    
+        source_files = [(os.path.relpath(file_path, self.repo_path), file_path)
+                        for file_path in cpp_files + header_files]
+        
+        makefile_path = os.path.join(self.repo_path, 'Makefile')
+        if os.path.exists(makefile_path):
+            source_files.append(('Makefile', makefile_path))
+            
+        return source_files
+        
+    def _count_lines_safely(self, file_path: str) -> Optional[int]:
+        """
+        Count the lines of a file, reporting read errors.
+        
+        Args:
+            file_path: Path to the file
+            
+        Returns:
+            Number of lines, or None if the file could not be read
+        """
+        try:
+            return _count_file_lines(file_path)
+        except Exception as e:
+            print(f"Error counting lines in {file_path}: {e}")
+            return None
+            
+    def _source_signature(self, source_files: List[tuple]) -> Tuple[tuple, ...]:
+        """
+        Describe the current version of the source files.
+        
+        Args:
+            source_files: List of (display name, path) pairs
             
+        Returns:
+            (path, modification time, size) of each file, with None for files
+            that cannot be accessed
+        """
+        signature = []
+        for _, file_path in source_files:
+            try:
+                stat = os.stat(file_path)
+                signature.append((file_path, stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append((file_path, None, None))
+        return tuple(signature)
+        
     def _count_code_lines(self) -> str:
         """Count lines of code in the repository."""
-        extensions = ['.cpp', '.h', 'Makefile']
+        source_files = self._find_source_files()
+        
+        # The report is reused until a source file is added, removed or modified
+        signature = self._source_signature(source_files)
+        
+        if self._line_count_cache is not None and self._line_count_cache[0] == signature:
+            return self._line_count_cache[1]
+            
         line_counts = {}
         total_lines = 0
         
-        for extension in extensions:
-            if extension == 'Makefile':
-                makefile_path = Path(self.repo_path) / 'Makefile'
-                if makefile_path.exists():
-                    try:
-                        with open(makefile_path, 'r') as f:
-                            lines = len(f.readlines())
-                            line_counts['Makefile'] = lines
-                            total_lines += lines
-                    except Exception as e:
-                        print(f"Error counting lines in {makefile_path}: {e}")
-                continue
-                
-            for file_path in Path(self.repo_path).glob(f"**/*{extension}"):
-                if 'chatbot' in str(file_path):
-                    continue
-                    
-                try:
-                    with open(file_path, 'r') as f:
-                        lines = len(f.readlines())
-                        line_counts[str(file_path.relative_to(self.repo_path))] = lines
-                        total_lines += lines
-                except Exception as e:
-                    print(f"Error counting lines in {file_path}: {e}")
+        with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4)) as executor:
+            results = executor.map(self._count_lines_safely, [file_path for _, file_path in source_files])
+            
+        for (name, _), lines in zip(source_files, results):
+            if lines is not None:
+                line_counts[name] = lines
+                total_lines += lines
         
         if self.language == "ja":
             response = f"ソフトウエアの合計行数は {total_lines} 行です。\n\n"
@@ -246,32 +572,88 @@ class RAGChatbot:
         for file, count in line_counts.items():
             response += f"- {file}: {count}\n"
             
+        self._line_count_cache = (signature, response)
         return response
         
     def get_response(self, user_input: str) -> str:
         """
         Get response to user input.
         
+        The handlers are tried cheapest first, so questions the agent or the
+        pattern matcher can answer confidently never reach the LLM. A pattern
+        answer that is not confident is used only if RAG gives no answer.
+        
+        Args:
+            user_input: User's input text
+            
+        Returns:
+            Response string, or None if no handler could answer
+        """
+        response, confident = self._get_local_response(user_input)
+        if confident:
+            return response
+            
+        return self.get_response_with_rag(user_input) or response
+        
+    async def aget_response(self, user_input: str,
+                            on_token: Optional[Callable[[str], None]] = None) -> str:
+        """
+        Get response to user input, streaming RAG answers as they are generated.
+        
         Args:
             user_input: User's input text
+            on_token: Callback receiving each token of a RAG answer
             
         Returns:
-            Response string
+            Response string, or None if no handler could answer
+        """
+        response, confident = self._get_local_response(user_input)
+        if confident:
+            return response
+            
+        return await self.aget_response_with_rag(user_input, on_token) or response
+        
+    def _get_local_response(self, user_input: str) -> Tuple[Optional[str], bool]:
         """
-        rag_response = self.get_response_with_rag(user_input)
+        Get a response from the agent or the pattern matcher, without the LLM.
         
-        if not rag_response:
-            pattern_response = self.get_response_with_pattern_matching(user_input)
+        Args:
+            user_input: User's input text
             
-            if not pattern_response:
-                agent_response = self.get_response_with_agent(user_input)
-                if agent_response:
-                    return agent_response
-                return pattern_response
-                
-            return pattern_response
+        Returns:
+            The response (None if there is none) and whether it is confident
+            enough to skip RAG
+        """
+        agent_response = self.get_response_with_agent(user_input)
+        if agent_response:
+            return agent_response, True
             
-        return rag_response
+        try:
+            intent, pattern_response = self._get_pattern_response(user_input)
+        except NotImplementedError:
+            return None, False
+            
+        if not pattern_response:
+            return None, False
+            
+        return pattern_response, self._pattern_is_confident(user_input, intent, pattern_response)
+        
+    def _pattern_is_confident(self, user_input: str, intent: Optional[str], response: str) -> bool:
+        """
+        Check whether a pattern-matching answer is specific enough to skip RAG.
+        
+        Subclasses can override this to let RAG answer questions that only
+        matched a broad pattern.
+        
+        Args:
+            user_input: Normalized user input
+            intent: Intent matched by the pattern matcher
+            response: Response from pattern matching
+            
+        Returns:
+            True if the response should be returned without calling RAG
+        """
+        return True
         
     def show_greeting(self):
         """Display the initial greeting message (to be implemented by subclasses)."""
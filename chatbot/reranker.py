@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Cross-encoder reranking for the RAG retriever.
+"""
+
+from typing import List, Optional, Tuple
+
+from langchain_community.cross_encoders import BaseCrossEncoder
+
+class LazyCrossEncoder(BaseCrossEncoder):
+    """Cross-encoder that loads its model on the first scoring request."""
+
+    def __init__(self, model_name: str):
+        """
+        Initialize the cross-encoder.
+
+        Args:
+            model_name: Name of the HuggingFace cross-encoder model
+        """
+        self.model_name = model_name
+        self._model: Optional[BaseCrossEncoder] = None
+
+    def score(self, text_pairs: List[Tuple[str, str]]) -> List[float]:
+        """
+        Score (query, passage) pairs, loading the model if necessary.
+
+        Args:
+            text_pairs: List of (query, passage) pairs
+
+        Returns:
+            Relevance score for each pair
+        """
+        if self._model is None:
+            from langchain_community.cross_encoders import HuggingFaceCrossEncoder
+            self._model = HuggingFaceCrossEncoder(model_name=self.model_name)
+        return self._model.score(text_pairs)
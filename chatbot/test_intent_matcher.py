@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Test script to verify that every IntentMatcher backend picks the same intent as the original regex cascade.
+"""
+
+import re
+from itertools import combinations
+
+import intent_matcher
+from intent_matcher import IntentMatcher
+from chatbot import INTENTS
+from ja_chatbot import INTENTS as JA_INTENTS
+
+SAMPLE_QUERIES = [
+    "What is this project about?",
+    "How does the Gaussian kernel function work?",
+    "Explain the image processing pipeline",
+    "How do I compile and run the program?",
+    "Which libraries does it depend on?",
+    "What does sigma do in the blur?",
+    "Show me the main function",
+    "Tell me about the weather",
+]
+
+JA_SAMPLE_QUERIES = [
+    "このプロジェクトは何ですか？",
+    "ガウスカーネル関数はどのように動作しますか？",
+    "実行",
+    "プログラムを実行する方法",
+    "コンパイルと実行のコマンド",
+    "依存するライブラリは？",
+    "画像処理パイプラインの詳細",
+    "今日の天気",
+]
+
+def baseline_match(intents, text):
+    """Match the way the original chatbots did: one regex search per intent, in order."""
+    for name, keywords in intents:
+        if re.search("|".join(re.escape(keyword) for keyword in keywords), text):
+            return name
+    return None
+
+def build_matchers(intents):
+    """Build one matcher per backend that is installed."""
+    saved = (intent_matcher.ahocorasick, intent_matcher.re2)
+    matchers = {}
+    try:
+        if saved[0] is not None:
+            matchers["Aho-Corasick"] = IntentMatcher(intents)
+        if saved[1] is not None:
+            intent_matcher.ahocorasick = None
+            matchers["RE2 set"] = IntentMatcher(intents)
+        intent_matcher.ahocorasick = None
+        intent_matcher.re2 = None
+        matchers["substring scan"] = IntentMatcher(intents)
+    finally:
+        intent_matcher.ahocorasick, intent_matcher.re2 = saved
+    return matchers
+
+def build_queries(intents, samples):
+    """Combine the sample queries with every keyword and every pair of keywords."""
+    keywords = sorted({keyword for _, words in intents for keyword in words})
+    queries = [query.lower() for query in samples]
+    queries.extend(keywords)
+    queries.extend(f"{first} {second}" for first, second in combinations(keywords, 2))
+    queries.extend(f"{second} {first}" for first, second in combinations(keywords, 2))
+    return queries
+
+def test_backends(intents, samples, language):
+    """Test all installed backends against the baseline cascade."""
+    print(f"=== Testing {language} Intent Matching ===")
+    
+    queries = build_queries(intents, samples)
+    passed = True
+    
+    for backend, matcher in build_matchers(intents).items():
+        mismatches = [(query, matcher.match(query), baseline_match(intents, query))
+                      for query in queries
+                      if matcher.match(query) != baseline_match(intents, query)]
+        if mismatches:
+            passed = False
+            print(f"✗ {backend}: {len(mismatches)} of {len(queries)} queries differ")
+            for query, got, expected in mismatches[:5]:
+                print(f"  {query!r}: got {got}, expected {expected}")
+        else:
+            print(f"✓ {backend}: {len(queries)} queries match the baseline")
+    
+    print(f"{language} intent matching test: {'PASSED' if passed else 'FAILED'}\n")
+    return passed
+
+def test_shared_keyword():
+    """Test that 実行, a keyword of both main and usage, resolves to the higher-priority main."""
+    print("=== Testing Shared Keyword 実行 ===")
+    
+    passed = True
+    for backend, matcher in build_matchers(JA_INTENTS).items():
+        intent = matcher.match("実行")
+        if intent == "main":
+            print(f"✓ {backend}: 実行 -> main")
+        else:
+            passed = False
+            print(f"✗ {backend}: 実行 -> {intent}, expected main")
+    
+    print(f"Shared keyword test: {'PASSED' if passed else 'FAILED'}\n")
+    return passed
+
+def main():
+    """Main test function."""
+    print("=== Intent Matcher Test ===\n")
+    
+    if intent_matcher.ahocorasick is None:
+        print("Note: pyahocorasick is not installed; the Aho-Corasick backend is skipped.")
+    if intent_matcher.re2 is None:
+        print("Note: google-re2 is not installed; the RE2 backend is skipped.")
+    print()
+    
+    en_passed = test_backends(INTENTS, SAMPLE_QUERIES, "English")
+    ja_passed = test_backends(JA_INTENTS, JA_SAMPLE_QUERIES, "Japanese")
+    shared_passed = test_shared_keyword()
+    
+    print("=== Test Summary ===")
+    if en_passed and ja_passed and shared_passed:
+        print("✓ All tests passed!")
+    else:
+        print("✗ Some tests failed.")
+
+if __name__ == "__main__":
+    main()
@@ -46,7 +46,10 @@ def test_chatbot_response(chatbot, query, language="English"):
     
     pattern_response = chatbot.get_response_with_pattern_matching(query)
     print(f"\nPattern Matching Response:")
-    print(f"{pattern_response[:150]}..." if len(pattern_response) > 150 else pattern_response)
+    if pattern_response:
+        print(f"{pattern_response[:150]}..." if len(pattern_response) > 150 else pattern_response)
+    else:
+        print("No pattern matched")
     
     rag_response = chatbot.get_response_with_rag(query)
     if rag_response:
@@ -4,19 +4,88 @@ Vector database for storing and retrieving code embeddings.
 """
 
 import os
-from typing import List, Dict, Optional
+import json
+import asyncio
+import functools
+import uuid
+from typing import List, Dict, Optional, Tuple
 from pathlib import Path
 
-if os.getenv("HTTP_PROXY"):
-    os.environ["HTTP_PROXY"] = os.getenv("HTTP_PROXY")
-if os.getenv("HTTPS_PROXY"):
-    os.environ["HTTPS_PROXY"] = os.getenv("HTTPS_PROXY")
-if os.getenv("NO_PROXY"):
-    os.environ["NO_PROXY"] = os.getenv("NO_PROXY")
+# Importing the configuration loads .env, so proxy settings are in the
+# environment before the HTTP clients are imported
+from config import CONFIG
 
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_openai import OpenAIEmbeddings, AzureOpenAIEmbeddings
 from langchain_community.vectorstores import Chroma
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from embeddings import CachedEmbeddings, ConcurrentEmbeddings, EmbeddingCache
+
+# Sidecar file recording which version of the source code the index was built from
+_MANIFEST_FILE = ".chatbot_index.json"
+
+# HNSW settings of the collection. Larger M and construction_ef improve recall
+# at the cost of indexing time; search_ef trades query latency for recall.
+_COLLECTION_METADATA = {
+    "hnsw:space": "cosine",
+    "hnsw:M": 32,
+    "hnsw:construction_ef": 200,
+    "hnsw:search_ef": 64
+}
+
+@functools.lru_cache(maxsize=None)
+def _load_huggingface_embeddings(batch_size: int, backend: str) -> Tuple[Embeddings, str]:
+    """
+    Load the local embedding model, once per process.
+    
+    The English and Japanese vector stores share the loaded weights instead of
+    reading the model from disk twice.
+    
+    Args:
+        batch_size: Number of texts encoded per batch
+        backend: "torch" or "onnx" (ONNX Runtime)
+        
+    Returns:
+        The embedding model and its name used in the embedding cache key
+    """
+    import torch
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+    
+    # With PyTorch on a GPU the weights are loaded in half precision, which
+    # halves the memory traffic of the encoder; the CPU keeps float32. On the
+    # CPU, ONNX Runtime runs the int8-quantized export published with the model
+    model_kwargs = {}
+    model_name = "huggingface:all-MiniLM-L6-v2"
+    if backend == "onnx":
+        model_kwargs = {"backend": "onnx"}
+        if torch.cuda.is_available():
+            model_kwargs["device"] = "cuda"
+            model_name = f"{model_name}:onnx"
+        else:
+            model_kwargs["model_kwargs"] = {"file_name": "onnx/model_quint8_avx2.onnx"}
+            model_name = f"{model_name}:onnx-quint8"
+    elif torch.cuda.is_available():
+        dtype = torch.bfloat16 if torch.cuda.is_bf16_supported() else torch.float16
+        model_kwargs = {"device": "cuda", "model_kwargs": {"torch_dtype": dtype}}
+        model_name = f"{model_name}:{str(dtype).removeprefix('torch.')}"
+    
+    embeddings = HuggingFaceEmbeddings(
+        model_name="all-MiniLM-L6-v2",
+        model_kwargs=model_kwargs,
+        encode_kwargs={"batch_size": batch_size}
+    )
+    
+    # Compiling the transformer removes most of the Python overhead of
+    # encoding single queries; it is compiled on the first forward pass
+    if backend == "torch" and torch.cuda.is_available() and hasattr(torch, "compile"):
+        transformer = embeddings.client[0]
+        transformer.auto_model = torch.compile(
+            transformer.auto_model,
+            mode="reduce-overhead",
+            dynamic=True
+        )
+    
+    return embeddings, model_name
 
 class VectorStore:
     """Vector store for code embeddings using ChromaDB."""
@@ -33,36 +102,161 @@ class VectorStore:
         
         os.makedirs(persist_directory, exist_ok=True)
         
-        if os.getenv("AZURE_OPENAI_API_KEY") and os.getenv("AZURE_OPENAI_ENDPOINT"):
-            self.embeddings = AzureOpenAIEmbeddings(
-                azure_deployment=os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME", "embedding"),
-                azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-                api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-                api_version=os.getenv("AZURE_OPENAI_API_VERSION", "2023-05-15")
+        # Number of texts sent to the embedding model per request
+        batch_size = CONFIG.embed_batch
+        
+        if CONFIG.use_azure:
+            from langchain_openai import AzureOpenAIEmbeddings
+            model_name = f"azure:{CONFIG.azure_openai_embedding_deployment_name}"
+            embeddings = AzureOpenAIEmbeddings(
+                azure_deployment=CONFIG.azure_openai_embedding_deployment_name,
+                azure_endpoint=CONFIG.azure_openai_endpoint,
+                api_key=CONFIG.azure_openai_api_key,
+                api_version=CONFIG.azure_openai_api_version,
+                chunk_size=batch_size
             )
-        elif os.getenv("OPENAI_API_KEY") and embedding_model:
-            self.embeddings = OpenAIEmbeddings(model=embedding_model)
+            embeddings = ConcurrentEmbeddings(embeddings, batch_size, CONFIG.embedding_concurrency)
+        elif CONFIG.use_openai and embedding_model:
+            from langchain_openai import OpenAIEmbeddings
+            model_name = f"openai:{embedding_model}"
+            embeddings = OpenAIEmbeddings(model=embedding_model, chunk_size=batch_size)
+            embeddings = ConcurrentEmbeddings(embeddings, batch_size, CONFIG.embedding_concurrency)
         else:
-            self.embeddings = HuggingFaceEmbeddings(
-                model_name="all-MiniLM-L6-v2"
-            )
+            embeddings, model_name = _load_huggingface_embeddings(batch_size, CONFIG.embedding_backend)
+            
+        # Chunks whose text was embedded before, e.g. in unchanged files, are
+        # served from the cache instead of being sent to the model again
+        self.embeddings = CachedEmbeddings(
+            embeddings,
+            EmbeddingCache(CONFIG.embed_cache_db),
+            model_name
+        )
             
-        self.db = None
+        self._db = None
+        self._deferred = False
         
-    def index_documents(self, documents: List[Dict]) -> None:
+    @property
+    def db(self) -> Optional[Chroma]:
+        """Chroma database, opened on first access if loading was deferred."""
+        if self._deferred:
+            self._deferred = False
+            if not self.load_existing_index():
+                # Rebuild the index on the next start instead of trusting it again
+                self._remove_manifest()
+        return self._db
+        
+    @db.setter
+    def db(self, value: Optional[Chroma]) -> None:
+        self._deferred = False
+        self._db = value
+        
+    def defer_load(self) -> None:
+        """Open the persisted index on first access to db instead of now."""
+        self._deferred = True
+        
+    def manifest_matches(self, fingerprint: str) -> bool:
         """
-        Index documents in the vector store.
+        Check whether the index was built from the source code with the given fingerprint.
         
         Args:
-            documents: List of documents to index
+            fingerprint: Fingerprint of the source code and the embedding model
+            
+        Returns:
+            True if the manifest written after indexing records the same fingerprint
+            and a non-empty index
         """
-        self.db = Chroma.from_documents(
-            documents=documents,
-            embedding=self.embeddings,
-            persist_directory=self.persist_directory
+        if not os.path.exists(os.path.join(self.persist_directory, "chroma.sqlite3")):
+            return False
+            
+        try:
+            with open(os.path.join(self.persist_directory, _MANIFEST_FILE), encoding="utf-8") as f:
+                manifest = json.load(f)
+            return manifest.get("fingerprint") == fingerprint and manifest.get("count", 0) > 0
+        except (OSError, ValueError, AttributeError, TypeError):
+            return False
+            
+    def write_manifest(self, fingerprint: str, count: int) -> None:
+        """
+        Record the fingerprint of the source code the index was built from.
+        
+        Args:
+            fingerprint: Fingerprint of the source code and the embedding model
+            count: Number of document chunks in the index
+        """
+        with open(os.path.join(self.persist_directory, _MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump({"fingerprint": fingerprint, "count": count}, f)
+            
+    def _remove_manifest(self) -> None:
+        """Remove the manifest, so the index is rebuilt on the next start."""
+        try:
+            os.remove(os.path.join(self.persist_directory, _MANIFEST_FILE))
+        except FileNotFoundError:
+            pass
+        
+    def _open_collection(self) -> Chroma:
+        """
+        Open the persisted collection, creating it with the HNSW settings if needed.
+        
+        Returns:
+            Chroma database backed by the collection
+        """
+        return Chroma(
+            persist_directory=self.persist_directory,
+            embedding_function=self.embeddings,
+            collection_metadata=_COLLECTION_METADATA
         )
+        
+    def index_documents(self, documents: List[Dict], batch_size: int = 100) -> None:
+        """
+        Index documents in the vector store, replacing any previous index.
+        
+        All documents are embedded in one call, which the embedding model splits
+        into its own request batches. The records are then written to Chroma in
+        batches of batch_size, which keeps each insert below Chroma's maximum
+        batch size while amortizing the per-call overhead.
+        
+        Args:
+            documents: List of documents to index
+            batch_size: Number of records written to Chroma per call
+        """
+        # Embed before touching the previous index, so a failed request to the
+        # embedding model leaves the old index usable
+        texts = [document.page_content for document in documents]
+        metadatas = [document.metadata for document in documents]
+        vectors = self.embeddings.embed_documents(texts)
+        ids = [str(uuid.uuid4()) for _ in documents]
+        
+        # A partially written index must never be trusted by the manifest
+        self._remove_manifest()
+        
+        # The HNSW settings only take effect when the collection is created, so
+        # a previous index is dropped rather than extended
+        self._open_collection().delete_collection()
+        self.db = self._open_collection()
+        
+        for start in range(0, len(documents), batch_size):
+            end = start + batch_size
+            self.db._collection.upsert(
+                ids=ids[start:end],
+                embeddings=vectors[start:end],
+                documents=texts[start:end],
+                metadatas=metadatas[start:end]
+            )
         self.db.persist()
         
+    def get_documents(self) -> List[Document]:
+        """
+        Get all document chunks stored in the vector store.
+        
+        Returns:
+            List of indexed document chunks
+        """
+        data = self.db.get(include=["documents", "metadatas"])
+        return [
+            Document(page_content=text, metadata=metadata or {})
+            for text, metadata in zip(data["documents"], data["metadatas"])
+        ]
+        
     def load_existing_index(self) -> bool:
         """
         Load existing index if available.
@@ -78,13 +272,10 @@ class VectorStore:
             return False
             
         try:
-            self.db = Chroma(
-                persist_directory=self.persist_directory,
-                embedding_function=self.embeddings
-            )
+            self.db = self._open_collection()
             
             # Verify the database has documents
-            collection_count = len(self.db._collection.get()['ids'])
+            collection_count = self.db._collection.count()
             if collection_count == 0:
                 print(f"Vector database exists but contains no documents in {self.persist_directory}")
                 return False
@@ -111,3 +302,19 @@ class VectorStore:
                 raise ValueError("No index available. Please index documents first.")
                 
         return self.db.similarity_search(query, k=k)
+        
+    async def asimilarity_search(self, query: str, k: int = 3) -> List[Dict]:
+        """
+        Search for similar documents without blocking the event loop.
+        
+        The query is embedded and searched in a worker thread, so concurrent
+        searches overlap instead of queueing behind each other.
+        
+        Args:
+            query: Query string
+            k: Number of results to return
+            
+        Returns:
+            List of similar documents
+        """
+        return await asyncio.to_thread(self.similarity_search, query, k)